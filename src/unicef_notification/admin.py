@@ -1,9 +1,190 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.contrib.admin.views.main import ChangeList, PAGE_VAR
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+from django.utils.translation import gettext_lazy as _, ngettext
 
-from unicef_notification.models import Notification
+from unicef_notification.models import EmailTemplate, Notification, NotificationPreference, SuppressedAddress
+from unicef_notification.routers import replica_reads
+
+# query string parameter of the id the page follows, see KeysetPaginator
+AFTER_VAR = "after"
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that counts the rows of an unfiltered queryset from the
+    postgres planner statistics, instead of COUNT(*) over the whole table.
+    """
+
+    # tables estimated to be smaller than this are counted exactly
+    threshold = 10000
+
+    @cached_property
+    def count(self):
+        query = getattr(self.object_list, "query", None)
+        if query is not None and not query.where:
+            estimate = self.estimate_count()
+            if estimate >= self.threshold:
+                return estimate
+        return super().count
+
+    def estimate_count(self):
+        queryset = self.object_list
+        with connections[queryset.db].cursor() as cursor:
+            cursor.execute(
+                "SELECT reltuples FROM pg_class WHERE oid = %s::regclass",
+                [queryset.model._meta.db_table],
+            )
+            row = cursor.fetchone()
+        # reltuples is -1 for tables that were never analyzed
+        return int(row[0]) if row else -1
+
+
+class KeysetPaginator(EstimatedCountPaginator):
+    """
+    Paginator that reads the page following id after, in a queryset ordered
+    by descending id, as the rows with a lower id (keyset pagination), rather
+    than by skipping the rows of all the previous pages with OFFSET.
+    """
+
+    def __init__(self, *args, after=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.after = after
+
+    def page(self, number):
+        query = getattr(self.object_list, "query", None)
+        # only for the descending id order, possibly repeated by the admin
+        if self.after is None or query is None or not {"-id", "-pk"}.issuperset(query.order_by or ["id"]):
+            return super().page(number)
+        number = self.validate_number(number)
+        object_list = self.object_list.filter(pk__lt=self.after)[:self.per_page]
+        return self._get_page(object_list, number, self)
+
+
+class KeysetChangeList(ChangeList):
+    """
+    ChangeList whose link to the next page holds the last id of the page,
+    for KeysetPaginator; the other links drop it.
+    """
+
+    def get_filters_params(self, params=None):
+        params = super().get_filters_params(params)
+        params.pop(AFTER_VAR, None)
+        return params
+
+    def get_query_string(self, new_params=None, remove=None):
+        new_params = dict(new_params or {})
+        remove = list(remove or []) + [AFTER_VAR]
+        result_list = getattr(self, "result_list", None)
+        if result_list is not None and new_params.get(PAGE_VAR) == self.page_num + 1:
+            results = list(result_list)
+            if results:
+                new_params[AFTER_VAR] = results[-1].pk
+        return super().get_query_string(new_params, remove)
+
+
+class TemplateNameListFilter(admin.SimpleListFilter):
+    """Lists the EmailTemplate names, rather than the distinct notification ones"""
+
+    title = _("Template Name")
+    parameter_name = "template_name"
+
+    def lookups(self, request, model_admin):
+        names = EmailTemplate.objects.filter(language="").order_by("name").values_list("name", flat=True)
+        return [(name, name) for name in names]
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(template_name=self.value())
+        return queryset
 
 
 @admin.register(Notification)
 class NotificationAdmin(admin.ModelAdmin):
-    list_display = ("id", "subject", "sent_recipients")
+    list_display = ("id", "subject", "template_name", "status", "created", "sent_recipients")
+    list_filter = (
+        "status",
+        "method_type",
+        TemplateNameListFilter,
+        ("created", admin.DateFieldListFilter),
+    )
+    # recipients are searched by exact address, using their GIN index
+    search_fields = ("=recipients",)
     raw_id_fields = ("sent_email",)
+    ordering = ("-id",)
+    paginator = KeysetPaginator
+    show_full_result_count = False
+    actions = ("resend", "cancel")
+    # notifications updated per query by the actions
+    action_batch_size = 1000
+
+    def get_changelist(self, request, **kwargs):
+        return KeysetChangeList
+
+    def get_paginator(self, request, queryset, per_page, orphans=0, allow_empty_first_page=True):
+        try:
+            after = int(request.GET[AFTER_VAR])
+        except (KeyError, ValueError):
+            after = None
+        return self.paginator(queryset, per_page, orphans, allow_empty_first_page, after=after)
+
+    def get_search_results(self, request, queryset, search_term):
+        search_term = search_term.strip()
+        if not search_term:
+            return queryset, False
+        return queryset.addressed_to(search_term), False
+
+    def changelist_view(self, request, extra_context=None):
+        if request.method != "GET":
+            return super().changelist_view(request, extra_context)
+        # browsing the history reads from the replica, if routed to one
+        with replica_reads():
+            response = super().changelist_view(request, extra_context)
+            if hasattr(response, "render"):
+                response.render()
+        return response
+
+    @admin.action(description=_("Resend selected notifications"))
+    def resend(self, request, queryset):
+        count = queryset.resend(batch_size=self.action_batch_size)
+        self.message_user(
+            request,
+            ngettext(
+                "%d notification queued.",
+                "%d notifications queued.",
+                count,
+            )
+            % count,
+            messages.SUCCESS,
+        )
+
+    @admin.action(description=_("Cancel selected pending notifications"))
+    def cancel(self, request, queryset):
+        count = queryset.cancel(batch_size=self.action_batch_size)
+        self.message_user(
+            request,
+            ngettext(
+                "%d notification cancelled.",
+                "%d notifications cancelled.",
+                count,
+            )
+            % count,
+            messages.SUCCESS,
+        )
+
+
+@admin.register(SuppressedAddress)
+class SuppressedAddressAdmin(admin.ModelAdmin):
+    list_display = ("address", "reason", "expires", "created")
+    list_filter = ("reason",)
+    search_fields = ("address",)
+
+
+@admin.register(NotificationPreference)
+class NotificationPreferenceAdmin(admin.ModelAdmin):
+    list_display = ("user", "address", "template_name", "template_group", "method_type", "enabled")
+    list_filter = ("method_type", "enabled")
+    search_fields = ("address", "user__email", "template_name")
+    raw_id_fields = ("user",)
@@ -0,0 +1,39 @@
+import logging
+import warnings
+
+from django.apps import AppConfig
+from django.conf import settings
+from django.db import connections, DatabaseError
+
+logger = logging.getLogger(__name__)
+
+
+class UnicefNotificationConfig(AppConfig):
+    name = "unicef_notification"
+    verbose_name = "UNICEF Notification"
+    default_auto_field = "django.db.models.AutoField"
+
+    def ready(self):
+        # connects the EmailTemplate signal handlers
+        from unicef_notification import cache
+
+        if getattr(settings, "UNICEF_NOTIFICATION_PRELOAD_TEMPLATES", False):
+            self.preload_templates(cache)
+
+    def preload_templates(self, cache):
+        # Querying the database from ready() is intentional here, so that
+        # every worker process starts with warm template caches.
+        with warnings.catch_warnings():
+            warnings.filterwarnings(
+                "ignore",
+                message="Accessing the database during app initialization",
+                category=RuntimeWarning,
+            )
+            try:
+                cache.preload_templates()
+            except DatabaseError:
+                # e.g. running `migrate` against an empty database
+                logger.warning("Unable to preload email templates.", exc_info=True)
+            finally:
+                # do not leak a connection into forked worker processes
+                connections.close_all()
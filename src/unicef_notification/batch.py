@@ -0,0 +1,88 @@
+import threading
+from contextlib import contextmanager
+
+from django.db import transaction
+
+from unicef_notification.context import ContextMemo
+from unicef_notification.preferences import apply_preferences
+
+_local = threading.local()
+
+
+def get_current_batch():
+    """Return the innermost active NotificationBatch of this thread, if any"""
+    batches = getattr(_local, "batches", None)
+    return batches[-1] if batches else None
+
+
+class NotificationBatch:
+    """
+    Notifications created while the batch is active, buffered until
+    the surrounding transaction commits.
+    """
+
+    def __init__(self, using=None):
+        self.using = using
+        self.notifications = []
+        # notifications to dispatch once persisted
+        self.to_send = []
+        # (template name, language) already validated in this batch
+        self.template_names = set()
+        # values shared by the contexts of the notifications
+        self.memo = ContextMemo()
+
+    def add(self, notification, send=True):
+        # validate now, so errors are raised to the caller and not on commit
+        exclude = None
+        template = (notification.template_name, notification.language)
+        if template in self.template_names:
+            exclude = ["template_name"]
+        notification.full_clean(exclude=exclude)
+        if notification.template_name:
+            self.template_names.add(template)
+        self.notifications.append(notification)
+        if send:
+            self.to_send.append(notification)
+
+    def flush(self):
+        """Persist the buffered notifications in bulk, then dispatch them"""
+        from unicef_notification.models import Notification
+
+        notifications, self.notifications = self.notifications, []
+        to_send, self.to_send = self.to_send, []
+        if not notifications:
+            return
+        # the preferences of all the recipients, in one query
+        apply_preferences(notifications)
+        for notification in notifications:
+            if notification.is_suppressed:
+                notification.status = Notification.STATUS.suppressed
+            if not notification.sender_email:
+                notification.sender_email = notification.get_sender_email()
+        Notification.objects.using(self.using).bulk_create(notifications)
+        Notification.send_bulk(
+            [n for n in to_send if n.status != Notification.STATUS.suppressed]
+        )
+
+
+@contextmanager
+def notification_batch(using=None):
+    """
+    Buffer the notifications created by `send_notification` and
+    `send_notification_with_template` inside the block.
+
+    The block runs in a transaction; the notifications are saved and sent,
+    in bulk, only when that transaction (or the outermost one containing it)
+    commits, and are discarded if it is rolled back.
+    """
+    batches = getattr(_local, "batches", None)
+    if batches is None:
+        batches = _local.batches = []
+    batch = NotificationBatch(using=using)
+    with transaction.atomic(using=using):
+        batches.append(batch)
+        try:
+            yield batch
+        finally:
+            batches.pop()
+        transaction.on_commit(batch.flush, using=using)
@@ -0,0 +1,109 @@
+"""
+In-process caches of EmailTemplate data.
+
+Nothing is cached unless ``preload_templates`` is called, either explicitly or
+at startup when ``UNICEF_NOTIFICATION_PRELOAD_TEMPLATES`` is enabled.
+
+Changes made in the process are applied at once, through the EmailTemplate
+signals; changes made by other processes, e.g. by ``update_notifications``,
+after at most ``UNICEF_NOTIFICATION_PRELOAD_TTL`` seconds, when the cached
+entries are checked against the database again.
+"""
+import logging
+import time
+
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.template import engines
+from django.template.backends.django import DjangoTemplates
+from django.template.loaders.cached import Loader as CachedLoader
+
+from post_office import cache as post_office_cache
+from post_office.models import EmailTemplate
+
+from unicef_notification.loaders import EmailTemplateLoader, get_preload_ttl
+
+logger = logging.getLogger(__name__)
+
+# (name, language) of EmailTemplate objects known to exist -> time.monotonic()
+# they were loaded at
+_template_names = {}
+
+
+def is_known_template_name(name, language=""):
+    loaded = _template_names.get((name, language))
+    return loaded is not None and time.monotonic() - loaded < get_preload_ttl()
+
+
+def get_email_template_loaders():
+    """Return the EmailTemplateLoader instances of all Django template engines"""
+
+    def find(loaders):
+        for loader in loaders:
+            if isinstance(loader, EmailTemplateLoader):
+                yield loader
+            elif isinstance(loader, CachedLoader):
+                yield from find(loader.loaders)
+
+    for backend in engines.all():
+        if isinstance(backend, DjangoTemplates):
+            yield from find(backend.engine.template_loaders)
+
+
+def _post_office_cache_enabled():
+    return getattr(settings, "POST_OFFICE_CACHE", True) and getattr(
+        settings, "POST_OFFICE_TEMPLATE_CACHE", True
+    )
+
+
+def cache_email_templates(templates):
+    """
+    Add EmailTemplate objects fetched from the database to post_office's
+    template cache, and to the known template names.
+    """
+    use_post_office_cache = _post_office_cache_enabled()
+    now = time.monotonic()
+    for template in templates:
+        if use_post_office_cache:
+            post_office_cache.set(
+                "{}:{}".format(template.name, template.language), template
+            )
+        _template_names[(template.name, template.language)] = now
+
+
+def preload_templates():
+    """
+    Load all EmailTemplate objects with a single query and warm up
+    the template caches with them:
+
+    * post_office's template cache, used by ``mail.send``
+    * the compiled templates of every EmailTemplateLoader
+    * the set of known template names, used by ``validate_template_name``
+
+    Return the number of templates loaded.
+    """
+    templates = list(EmailTemplate.objects.all())
+    cache_email_templates(templates)
+
+    default_templates = [t for t in templates if not t.language]
+    for loader in get_email_template_loaders():
+        loader.preload(default_templates)
+
+    logger.info("Preloaded %d email templates", len(templates))
+    return len(templates)
+
+
+def clear():
+    """Empty all in-process template caches"""
+    _template_names.clear()
+    for loader in get_email_template_loaders():
+        loader.reset()
+
+
+@receiver(post_save, sender=EmailTemplate)
+@receiver(post_delete, sender=EmailTemplate)
+def invalidate_template(sender, instance, **kwargs):
+    _template_names.pop((instance.name, instance.language), None)
+    for loader in get_email_template_loaders():
+        loader.forget(instance.name)
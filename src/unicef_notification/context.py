@@ -0,0 +1,94 @@
+"""
+Context providers of notification templates.
+
+A notification definition module can name a provider for its template::
+
+    context_provider = "myapp.notifications.providers.partner_context"
+
+The provider is called with the context of each notification and a
+ContextMemo, and returns the items to add to the context. Lookups shared
+by many notifications go through the memo, so they are done once per
+batch (a ``notification_batch()`` block, or a chunk of
+``send_notification_to_queryset``)::
+
+    def partner_context(context, memo):
+        partner = memo.get(
+            ("partner", context["partner_id"]),
+            lambda: memo.serialize(Partner.objects.get(pk=context["partner_id"])),
+        )
+        return {"partner": partner}
+"""
+import threading
+
+from django.utils.module_loading import import_string
+
+_providers = {}
+_discovered = False
+_lock = threading.Lock()
+
+
+class ContextMemo:
+    """Values computed once, by key, for a batch of notifications"""
+
+    def __init__(self):
+        self._values = {}
+
+    def get(self, key, compute):
+        try:
+            return self._values[key]
+        except KeyError:
+            value = self._values[key] = compute()
+            return value
+
+    def serialize(self, obj):
+        """Return the dictionary of model instance obj, as serialize_dict does"""
+        from unicef_notification.utils import model_to_dictionary
+
+        return self.get(
+            ("serialize", obj._meta.label, obj.pk), lambda: model_to_dictionary(obj)
+        )
+
+
+def register_context_provider(template_name, provider):
+    """Use provider, a callable or its dotted path, for template_name"""
+    if isinstance(provider, str):
+        provider = import_string(provider)
+    _providers[template_name] = provider
+
+
+def _discover():
+    global _discovered
+    from unicef_notification.utils import get_notification_modules
+
+    with _lock:
+        if _discovered:
+            return
+        for module in get_notification_modules():
+            provider = getattr(module, "context_provider", None)
+            # providers registered explicitly take precedence
+            if provider is not None and module.name not in _providers:
+                register_context_provider(module.name, provider)
+        _discovered = True
+
+
+def get_context_provider(template_name):
+    """Return the context provider of template_name, or None"""
+    if not _discovered:
+        _discover()
+    return _providers.get(template_name)
+
+
+def provide_context(template_name, context, memo):
+    """Return context, with the items of the provider of template_name added"""
+    provider = get_context_provider(template_name)
+    if provider is None:
+        return context
+    context = dict(context or {})
+    context.update(provider(context, memo))
+    return context
+
+
+def clear():
+    global _discovered
+    _providers.clear()
+    _discovered = False
@@ -0,0 +1,65 @@
+import threading
+from contextlib import contextmanager
+
+from django.db import models
+from django.db.models.query_utils import DeferredAttribute
+
+_local = threading.local()
+
+
+@contextmanager
+def row_values():
+    """Read and assign the values of the notification rows, ignoring their archive"""
+    previous = getattr(_local, "row_values", False)
+    _local.row_values = True
+    try:
+        yield
+    finally:
+        _local.row_values = previous
+
+
+class ArchivedAttribute(DeferredAttribute):
+    """
+    Attribute of a field that archive_notifications moves to
+    NotificationArchive: once the notification is archived, the cleared value
+    is read from the archive instead, unless a value was assigned since the
+    notification was loaded.
+    """
+
+    def __get__(self, instance, cls=None):
+        if instance is None:
+            return self
+        value = super().__get__(instance, cls)
+        if (
+            value in ("", None)
+            and not getattr(_local, "row_values", False)
+            and self.field.attname not in instance.__dict__.get("_unarchived", ())
+            # loaded, if deferred
+            and instance.archived
+        ):
+            return instance.get_archived_data().get(self.field.attname, value)
+        return value
+
+    def __set__(self, instance, value):
+        instance.__dict__[self.field.attname] = value
+        if not instance._state.adding and not getattr(_local, "row_values", False):
+            # replaces the archived value, see Notification.save
+            instance.__dict__.setdefault("_unarchived", set()).add(self.field.attname)
+
+
+class ArchivedFieldMixin:
+    descriptor_class = ArchivedAttribute
+
+    def pre_save(self, model_instance, add):
+        # save the value of the row, not the archived one
+        if self.attname not in model_instance.__dict__:
+            model_instance.refresh_from_db(fields=[self.attname])
+        return model_instance.__dict__[self.attname]
+
+
+class ArchivedTextField(ArchivedFieldMixin, models.TextField):
+    pass
+
+
+class ArchivedJSONField(ArchivedFieldMixin, models.JSONField):
+    pass
@@ -0,0 +1,44 @@
+"""
+Optional GIN index of Notification.template_data, serving the containment
+queries of ``Notification.objects.about()``.
+
+It is opt-in, as every notification inserted then updates it: it is created
+by the migrations if UNICEF_NOTIFICATION_TEMPLATE_DATA_INDEX is set when
+migrating, or at any time by the ``template_data_index`` command.
+"""
+from django.conf import settings
+
+TEMPLATE_DATA_INDEX = "notification_template_data_idx"
+
+CREATE_INDEX = """
+CREATE INDEX {concurrently} IF NOT EXISTS {index}
+    ON unicef_notification_notification USING gin (template_data jsonb_path_ops)
+"""
+
+DROP_INDEX = "DROP INDEX {concurrently} IF EXISTS {index}"
+
+
+def is_enabled():
+    return getattr(settings, "UNICEF_NOTIFICATION_TEMPLATE_DATA_INDEX", False)
+
+
+def _execute(connection, sql, concurrently):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            sql.format(
+                concurrently="CONCURRENTLY" if concurrently else "",
+                index=connection.ops.quote_name(TEMPLATE_DATA_INDEX),
+            )
+        )
+
+
+def create_template_data_index(connection, concurrently=True):
+    """
+    Create the index, concurrently unless told otherwise, which cannot be
+    done in a transaction
+    """
+    _execute(connection, CREATE_INDEX, concurrently)
+
+
+def drop_template_data_index(connection, concurrently=True):
+    _execute(connection, DROP_INDEX, concurrently)
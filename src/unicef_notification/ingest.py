@@ -0,0 +1,146 @@
+"""
+Bulk creation of notifications through postgres COPY FROM STDIN.
+
+Notifications are read from an iterable, possibly a generator, in batches;
+ids are reserved from the table sequence for each batch, and its rows are
+streamed to COPY as they are formatted, so neither the notifications nor
+the payload are held in memory beyond a batch. On other databases, the
+batches are created with bulk_create.
+"""
+import datetime
+import itertools
+import json
+
+from django.contrib.postgres.fields import ArrayField
+from django.db import connections, models, transaction
+
+NULL = "\\N"
+
+
+def _escape(text):
+    return (
+        text.replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
+
+
+def _array_literal(values):
+    items = []
+    for value in values:
+        if value is None:
+            items.append("NULL")
+        else:
+            items.append('"{}"'.format(str(value).replace("\\", "\\\\").replace('"', '\\"')))
+    return "{{{}}}".format(",".join(items))
+
+
+def format_value(field, value):
+    """Format value of field in the COPY text format"""
+    if value is None:
+        return NULL
+    if isinstance(field, ArrayField):
+        text = _array_literal(value)
+    elif isinstance(field, models.JSONField):
+        text = json.dumps(value, cls=field.encoder)
+    elif isinstance(value, bool):
+        text = "t" if value else "f"
+    elif isinstance(value, (datetime.date, datetime.time)):
+        text = value.isoformat()
+    else:
+        text = str(value)
+    return _escape(text)
+
+
+class RowReader:
+    """File-like object reading the lines of an iterator, for copy_expert"""
+
+    def __init__(self, lines):
+        self._lines = lines
+        self._buffer = ""
+
+    def read(self, size=-1):
+        while size < 0 or len(self._buffer) < size:
+            line = next(self._lines, None)
+            if line is None:
+                break
+            self._buffer += line
+        if size < 0:
+            size = len(self._buffer)
+        data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+
+def _reserve_ids(cursor, model, count):
+    cursor.execute(
+        "SELECT nextval(pg_get_serial_sequence(%s, %s)) FROM generate_series(1, %s)",
+        [model._meta.db_table, model._meta.pk.column, count],
+    )
+    return [row[0] for row in cursor.fetchall()]
+
+
+def _copy(cursor, sql, lines):
+    db_cursor = cursor.cursor
+    if hasattr(db_cursor, "copy_expert"):
+        # psycopg2
+        db_cursor.copy_expert(sql, RowReader(lines))
+        return
+    # psycopg 3
+    with db_cursor.copy(sql) as copy:
+        for line in lines:
+            copy.write(line)
+
+
+def copy_notifications(notifications, batch_size=10000, using="default"):
+    """
+    Create the unsaved Notification objects of the iterable notifications,
+    batch_size at a time, in one transaction. Like bulk_create, neither
+    save() nor signals are called, but the "From" address is resolved.
+
+    Return the ids of the notifications, which are also set on the objects.
+    """
+    from unicef_notification.models import Notification
+
+    connection = connections[using]
+    fields = Notification._meta.concrete_fields
+    sql = "COPY {} ({}) FROM STDIN".format(
+        connection.ops.quote_name(Notification._meta.db_table),
+        ", ".join(connection.ops.quote_name(field.column) for field in fields),
+    )
+
+    def format_row(notification):
+        values = []
+        for field in fields:
+            # sets auto_now_add fields
+            value = field.pre_save(notification, add=True)
+            if not isinstance(field, models.JSONField):
+                # JSONField.get_prep_value dumps the value before Django 4.2,
+                # format_value does for all versions
+                value = field.get_prep_value(value)
+            values.append(format_value(field, value))
+        return "\t".join(values) + "\n"
+
+    ids = []
+    iterator = iter(notifications)
+    with transaction.atomic(using=using):
+        while True:
+            batch = list(itertools.islice(iterator, batch_size))
+            if not batch:
+                break
+            for notification in batch:
+                if not notification.sender_email:
+                    notification.sender_email = notification.get_sender_email()
+            if connection.vendor != "postgresql":
+                Notification.objects.using(using).bulk_create(batch)
+                ids.extend(notification.pk for notification in batch)
+                continue
+            with connection.cursor() as cursor:
+                for notification, pk in zip(batch, _reserve_ids(cursor, Notification, len(batch))):
+                    notification.pk = pk
+                _copy(cursor, sql, (format_row(notification) for notification in batch))
+            for notification in batch:
+                notification._state.adding = False
+                notification._state.db = using
+            ids.extend(notification.pk for notification in batch)
+    return ids
@@ -1,28 +1,110 @@
+import logging
+import time
+from collections import namedtuple
+
 from django.conf import settings
-from django.template import Origin, TemplateDoesNotExist
+from django.template import Origin, Template, TemplateDoesNotExist, TemplateSyntaxError
 from django.template.loaders.base import Loader as BaseLoader
 
-from post_office.utils import get_email_template
+logger = logging.getLogger(__name__)
+
+# template compiled from an EmailTemplate last_updated at last_updated,
+# checked against the database at checked (time.monotonic())
+CompiledTemplate = namedtuple("CompiledTemplate", ["template", "last_updated", "checked"])
+
+
+def get_email_template_prefix():
+    return getattr(settings, "UNICEF_NOTIFICATION_EMAIL_TEMPLATE_PREFIX", "email-templates/")
 
-from unicef_notification.models import EmailTemplate
 
-EMAIL_TEMPLATE_PREFIX = getattr(
-    settings, "UNICEF_NOTIFICATION_EMAIL_TEMPLATE_PREFIX", "email-templates/"
-)
+def get_preload_ttl():
+    """
+    Seconds preloaded templates are used before being checked against the
+    database, as they can be changed by other processes
+    """
+    return getattr(settings, "UNICEF_NOTIFICATION_PRELOAD_TTL", 60)
+
+
+def __getattr__(name):
+    # EMAIL_TEMPLATE_PREFIX is read from the settings on use, not on import
+    if name == "EMAIL_TEMPLATE_PREFIX":
+        return get_email_template_prefix()
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
 
 
 class EmailTemplateLoader(BaseLoader):
+    def __init__(self, engine):
+        super().__init__(engine)
+        # compiled templates, filled by preload()
+        self.compiled_templates = {}
+
+    def get_template(self, template_name, skip=None):
+        compiled = self.compiled_templates.get(template_name)
+        if compiled is not None and time.monotonic() - compiled.checked >= get_preload_ttl():
+            compiled = self.revalidate(template_name, compiled)
+        if compiled is not None and not (skip and compiled.template.origin in skip):
+            return compiled.template
+        return super().get_template(template_name, skip=skip)
+
+    def revalidate(self, template_name, compiled):
+        """
+        Check a compiled template against its EmailTemplate, compiling it
+        again if it was changed, e.g. by another process
+        """
+        from post_office.models import EmailTemplate
+
+        email_template = EmailTemplate.objects.filter(
+            name=template_name[len(get_email_template_prefix()):], language=""
+        ).first()
+        if email_template is None:
+            self.compiled_templates.pop(template_name, None)
+            return None
+        if email_template.last_updated != compiled.last_updated:
+            self.preload([email_template])
+        else:
+            self.compiled_templates[template_name] = compiled._replace(checked=time.monotonic())
+        return self.compiled_templates.get(template_name)
+
+    def preload(self, email_templates):
+        prefix = get_email_template_prefix()
+        for email_template in email_templates:
+            template_name = "{}{}".format(prefix, email_template.name)
+            origin = Origin(
+                name=email_template.name,
+                template_name=template_name,
+                loader=self,
+            )
+            try:
+                self.compiled_templates[template_name] = CompiledTemplate(
+                    Template(email_template.html_content, origin, template_name, self.engine),
+                    email_template.last_updated,
+                    time.monotonic(),
+                )
+            except TemplateSyntaxError:
+                self.compiled_templates.pop(template_name, None)
+                logger.exception("Unable to compile email template %s", email_template.name)
+
+    def forget(self, name):
+        self.compiled_templates.pop("{}{}".format(get_email_template_prefix(), name), None)
+
+    def reset(self):
+        self.compiled_templates.clear()
+
     def get_template_sources(self, template_name):
-        if not template_name.startswith(EMAIL_TEMPLATE_PREFIX):
+        prefix = get_email_template_prefix()
+        if not template_name.startswith(prefix):
             return
 
         yield Origin(
-            name=template_name[len(EMAIL_TEMPLATE_PREFIX):],
+            name=template_name[len(prefix):],
             template_name=template_name,
             loader=self,
         )
 
     def load_template_source(self, template_name, template_dirs=None):
+        from post_office.models import EmailTemplate
+        from post_office.utils import get_email_template
+
         for origin in self.get_template_sources(template_name):
             try:
                 template = get_email_template(origin.name)
@@ -32,6 +114,9 @@ class EmailTemplateLoader(BaseLoader):
         raise TemplateDoesNotExist(template_name)
 
     def get_contents(self, origin):
+        from post_office.models import EmailTemplate
+        from post_office.utils import get_email_template
+
         try:
             template = get_email_template(origin.name)
             return template.html_content
@@ -0,0 +1,35 @@
+import datetime
+import logging
+
+from django.core.management import BaseCommand
+from django.utils import timezone
+
+from unicef_notification.models import NotificationArchive
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Move the content of old notifications to the compressed archive"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=180,
+            help="Archive the notifications created more than this many days ago",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of notifications archived per transaction",
+        )
+
+    def handle(self, *args, **options):
+        logger.info("Command started")
+
+        before = timezone.now() - datetime.timedelta(days=options["days"])
+        count = NotificationArchive.archive(before, batch_size=options["batch_size"])
+
+        logger.info("Command finished, %d notifications archived", count)
@@ -0,0 +1,40 @@
+import logging
+
+from django.core.management import BaseCommand
+
+from unicef_notification.models import Notification
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Store the resolved sender email on notifications created before it was denormalized"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of notifications updated per query",
+        )
+
+    def handle(self, *args, **options):
+        logger.info("Command started")
+
+        batch_size = options["batch_size"]
+        qs = Notification.objects.filter(sender_email="").order_by("pk")
+        last_pk = 0
+        total = 0
+        while True:
+            # prefetching the generic foreign key fetches the senders of the
+            # whole batch with one query per sender content type
+            batch = list(qs.filter(pk__gt=last_pk).prefetch_related("sender")[:batch_size])
+            if not batch:
+                break
+            for notification in batch:
+                notification.sender_email = notification.get_sender_email()
+            Notification.objects.bulk_update(batch, ["sender_email"])
+            total += len(batch)
+            last_pk = batch[-1].pk
+
+        logger.info("Command finished, %d notifications updated", total)
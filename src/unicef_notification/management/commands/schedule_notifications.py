@@ -0,0 +1,46 @@
+import logging
+import time
+
+from django.core.management import BaseCommand
+
+from unicef_notification.models import Notification
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Queue scheduled notifications that are due for sending"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of notifications queued per transaction",
+        )
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep checking for due notifications instead of exiting when there are none",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=10.0,
+            help="Seconds to wait between checks with --loop",
+        )
+
+    def handle(self, *args, **options):
+        logger.info("Command started")
+
+        total = 0
+        while True:
+            count = Notification.queue_scheduled(batch_size=options["batch_size"])
+            total += count
+            if count:
+                continue
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
+
+        logger.info("Command finished, %d notifications queued", total)
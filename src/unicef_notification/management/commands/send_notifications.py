@@ -0,0 +1,100 @@
+import logging
+import os
+import socket
+import time
+
+from django.core.management import BaseCommand, CommandError
+
+from post_office.models import PRIORITY
+
+from unicef_notification import wakeup
+from unicef_notification.models import Notification
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Send pending notifications, highest priority first"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--priority",
+            action="append",
+            choices=PRIORITY._fields,
+            help="Only send notifications with this priority; can be repeated "
+            "to dedicate workers to a lane, e.g. --priority high --priority now",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=100,
+            help="Number of notifications claimed per transaction",
+        )
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep waiting for new notifications instead of exiting when the queue is empty",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=1.0,
+            help="Seconds to wait between polls of an empty queue with --loop",
+        )
+        parser.add_argument(
+            "--shards",
+            type=int,
+            help="Number of shards the queue is split into, by notification id",
+        )
+        parser.add_argument(
+            "--shard",
+            type=int,
+            help="Shard sent by this worker, from 0 to --shards - 1",
+        )
+        parser.add_argument(
+            "--lease",
+            type=int,
+            help="Lease claimed notifications for this many seconds, instead of locking "
+            "them while they are sent; must exceed the time needed to send a batch",
+        )
+        parser.add_argument(
+            "--listen",
+            action="store_true",
+            help="Wait on postgres LISTEN for new notifications, polling only every --interval seconds; implies --loop",
+        )
+
+    def handle(self, *args, **options):
+        logger.info("Command started")
+
+        priorities = None
+        if options["priority"]:
+            priorities = [getattr(PRIORITY, name) for name in options["priority"]]
+
+        shard = None
+        if options["shards"]:
+            if options["shard"] is None or not 0 <= options["shard"] < options["shards"]:
+                raise CommandError("--shard must be between 0 and --shards - 1")
+            shard = (options["shard"], options["shards"])
+
+        worker = "{}:{}".format(socket.gethostname(), os.getpid())
+
+        total = 0
+        while True:
+            count = Notification.send_pending(
+                batch_size=options["batch_size"],
+                priorities=priorities,
+                shard=shard,
+                lease=options["lease"],
+                worker=worker,
+            )
+            total += count
+            if count:
+                continue
+            if options["listen"]:
+                wakeup.wait(options["interval"])
+            elif options["loop"]:
+                time.sleep(options["interval"])
+            else:
+                break
+
+        logger.info("Command finished, %d notifications sent", total)
@@ -0,0 +1,34 @@
+import logging
+
+from django.core.management import BaseCommand
+
+from unicef_notification.models import NotificationSummary
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Update the daily summary of notifications"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--margin",
+            type=int,
+            default=300,
+            help="Seconds before the last run to look for changes from, "
+            "for the transactions in progress at that time",
+        )
+        parser.add_argument(
+            "--full",
+            action="store_true",
+            help="Count all notifications again",
+        )
+
+    def handle(self, *args, **options):
+        logger.info("Command started")
+
+        count = NotificationSummary.summarize(
+            margin=options["margin"], full=options["full"]
+        )
+
+        logger.info("Command finished, %d summaries updated", count)
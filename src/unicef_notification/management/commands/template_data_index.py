@@ -0,0 +1,41 @@
+import logging
+
+from django.core.management import BaseCommand
+from django.db import connections, DEFAULT_DB_ALIAS
+
+from unicef_notification.indexes import create_template_data_index, drop_template_data_index
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Create the GIN index of notification template_data, used by Notification.objects.about()"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--drop",
+            action="store_true",
+            help="Drop the index instead",
+        )
+        parser.add_argument(
+            "--blocking",
+            action="store_true",
+            help="Build the index without CONCURRENTLY, locking writes to the notifications "
+            "while it is built; needed in a transaction",
+        )
+        parser.add_argument(
+            "--database",
+            default=DEFAULT_DB_ALIAS,
+            help="Database to create the index in",
+        )
+
+    def handle(self, *args, **options):
+        logger.info("Command started")
+
+        connection = connections[options["database"]]
+        if options["drop"]:
+            drop_template_data_index(connection, concurrently=not options["blocking"])
+        else:
+            create_template_data_index(connection, concurrently=not options["blocking"])
+
+        logger.info("Command finished")
@@ -1,51 +1,116 @@
+import hashlib
+import json
 import logging
-import os
-from importlib import import_module
+import zlib
 
-from django.apps import apps
-from django.conf import settings
 from django.core.management import BaseCommand
-from django.db import transaction
+from django.db import connection, OperationalError, transaction
 
 from post_office.models import EmailTemplate
 
+from unicef_notification import optimize
+from unicef_notification.models import TemplateSync
+from unicef_notification.utils import get_notification_modules
+from unicef_notification.versions import get_template_version_id
+
 logger = logging.getLogger(__name__)
 
-NOTIFICATION_TEMPLATE_DIR = getattr(
-    settings, "UNICEF_NOTIFICATION_TEMPLATE_DIR", "notifications"
-)
+# key of the postgres advisory lock held while syncing
+LOCK_KEY = zlib.crc32(b"unicef_notification.update_notifications")
+
+
+def get_content_hash(modules):
+    content = sorted(
+        [n.name, n.defaults, getattr(n, "translations", {})] for n in modules
+    )
+    # toggling the optimization changes the stored templates
+    serialized = json.dumps([content, optimize.is_enabled()], sort_keys=True, default=str)
+    return hashlib.sha256(serialized.encode("utf-8")).hexdigest()
 
 
 class Command(BaseCommand):
     help = "Create Notifications command"
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--lock",
+            action="store_true",
+            help="Sync in one process at a time, using a postgres advisory lock, and skip "
+            "the sync if the templates are already up to date",
+        )
+        parser.add_argument(
+            "--lock-timeout",
+            type=float,
+            help="With --lock, give up after waiting this many seconds for the lock; "
+            "0 skips immediately if another process holds it",
+        )
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="With --lock, sync even if the templates are up to date",
+        )
+
     @transaction.atomic
     def handle(self, *args, **options):
         logger.info("Command started")
 
-        # loop through apps
-        for app in apps.get_app_configs():
-            # check if notification template dir exists
-            notification_dir = "{}/{}".format(app.path, NOTIFICATION_TEMPLATE_DIR)
-            if os.path.isdir(notification_dir):
-                # walk through notification templates
-                filenames = [
-                    f
-                    for f in os.listdir(notification_dir)
-                    if os.path.isfile(os.path.join(notification_dir, f))
-                ]
-                for filename in filenames:
-                    if filename.startswith("__"):
-                        continue
-                    n = import_module(
-                        "{}.{}.{}".format(
-                            app.name, NOTIFICATION_TEMPLATE_DIR, filename.rsplit(".")[0]
-                        )
-                    )
-                    # creating email template objects
-                    logger.info(n.name)
-                    EmailTemplate.objects.update_or_create(
-                        name=n.name, defaults=n.defaults
-                    )
+        modules = get_notification_modules()
+        content_hash = get_content_hash(modules)
+
+        if options["lock"]:
+            if not self.acquire_lock(options["lock_timeout"]):
+                logger.info("Command skipped, templates are being synced by another process")
+                return
+            synced = TemplateSync.objects.filter(name=TemplateSync.UPDATE_NOTIFICATIONS).first()
+            if not options["force"] and synced and synced.content_hash == content_hash:
+                logger.info("Command skipped, templates are up to date")
+                return
+
+        for n in modules:
+            # creating email template objects
+            logger.info(n.name)
+            template, __ = EmailTemplate.objects.update_or_create(
+                name=n.name, language="", defaults=optimize.optimize_defaults(n.defaults)
+            )
+            get_template_version_id(template)
+            # translated variants, by language
+            for language, defaults in getattr(n, "translations", {}).items():
+                # matched by name and language only, so that an existing
+                # variant is updated rather than duplicated
+                variant, __ = EmailTemplate.objects.update_or_create(
+                    name=n.name,
+                    language=language,
+                    defaults=dict(optimize.optimize_defaults(defaults), default_template=template),
+                )
+                get_template_version_id(variant)
+
+        TemplateSync.objects.update_or_create(
+            name=TemplateSync.UPDATE_NOTIFICATIONS,
+            defaults={"content_hash": content_hash},
+        )
 
         logger.info("Command finished")
+
+    def acquire_lock(self, timeout):
+        """Take the advisory lock for the current transaction"""
+        with connection.cursor() as cursor:
+            if timeout == 0:
+                cursor.execute("SELECT pg_try_advisory_xact_lock(%s)", [LOCK_KEY])
+                return cursor.fetchone()[0]
+            if timeout is not None:
+                # only for the advisory lock, not the row locks of the sync
+                cursor.execute("SELECT current_setting('lock_timeout')")
+                previous = cursor.fetchone()[0]
+                cursor.execute(
+                    "SELECT set_config('lock_timeout', %s, true)", ["{}ms".format(int(timeout * 1000))]
+                )
+            try:
+                with transaction.atomic():
+                    cursor.execute("SELECT pg_advisory_xact_lock(%s)", [LOCK_KEY])
+            except OperationalError:
+                # lock_timeout expired
+                return False
+            finally:
+                if timeout is not None:
+                    cursor.execute("SELECT set_config('lock_timeout', %s, true)", [previous])
+            return True
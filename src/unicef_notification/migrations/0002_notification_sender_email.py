@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("unicef_notification", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="notification",
+            name="sender_email",
+            field=models.CharField(
+                blank=True, default="", max_length=255, verbose_name="Sender Email"
+            ),
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:42
+
+from django.db import migrations, models
+
+
+def mark_sent(apps, schema_editor):
+    # Notifications created before the status field are either sent, or
+    # were never queued; there is no way to tell failed ones apart.
+    Notification = apps.get_model("unicef_notification", "Notification")
+    Notification.objects.filter(sent_email__isnull=False).update(status="sent")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("unicef_notification", "0002_notification_sender_email"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="notification",
+            name="priority",
+            field=models.PositiveSmallIntegerField(
+                blank=True,
+                choices=[(0, "low"), (1, "medium"), (2, "high"), (3, "now")],
+                null=True,
+                verbose_name="Priority",
+            ),
+        ),
+        migrations.AddField(
+            model_name="notification",
+            name="status",
+            field=models.CharField(
+                choices=[
+                    ("draft", "Draft"),
+                    ("pending", "Pending"),
+                    ("sent", "Sent"),
+                    ("failed", "Failed"),
+                ],
+                default="draft",
+                max_length=20,
+                verbose_name="Status",
+            ),
+        ),
+        migrations.RunPython(mark_sent, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="notification",
+            index=models.Index(
+                models.OrderBy(models.F("priority"), descending=True, nulls_last=True),
+                models.F("id"),
+                condition=models.Q(("status", "pending")),
+                name="notification_queue_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("unicef_notification", "0003_notification_status_priority"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="notification",
+            name="send_at",
+            field=models.DateTimeField(blank=True, null=True, verbose_name="Send At"),
+        ),
+        migrations.AlterField(
+            model_name="notification",
+            name="status",
+            field=models.CharField(
+                choices=[
+                    ("draft", "Draft"),
+                    ("scheduled", "Scheduled"),
+                    ("pending", "Pending"),
+                    ("sent", "Sent"),
+                    ("failed", "Failed"),
+                ],
+                default="draft",
+                max_length=20,
+                verbose_name="Status",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="notification",
+            index=models.Index(
+                condition=models.Q(("status", "scheduled")),
+                fields=["send_at"],
+                name="notification_scheduled_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,70 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:43
+
+import django.contrib.postgres.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("unicef_notification", "0004_notification_send_at"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SuppressedAddress",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "address",
+                    models.CharField(
+                        max_length=255, unique=True, verbose_name="Address"
+                    ),
+                ),
+                (
+                    "reason",
+                    models.CharField(
+                        choices=[
+                            ("bounced", "Hard bounce"),
+                            ("complained", "Complaint"),
+                            ("unsubscribed", "Unsubscribed"),
+                            ("other", "Other"),
+                        ],
+                        default="other",
+                        max_length=20,
+                        verbose_name="Reason",
+                    ),
+                ),
+                (
+                    "expires",
+                    models.DateTimeField(blank=True, null=True, verbose_name="Expires"),
+                ),
+                (
+                    "created",
+                    models.DateTimeField(auto_now_add=True, verbose_name="Created"),
+                ),
+            ],
+            options={
+                "verbose_name_plural": "Suppressed Addresses",
+            },
+        ),
+        migrations.AddField(
+            model_name="notification",
+            name="suppressed_recipients",
+            field=django.contrib.postgres.fields.ArrayField(
+                base_field=models.CharField(max_length=255),
+                blank=True,
+                default=list,
+                size=None,
+                verbose_name="Suppressed Recipients",
+            ),
+        ),
+    ]
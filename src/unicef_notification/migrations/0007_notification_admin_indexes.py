@@ -0,0 +1,84 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:46
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def set_created(apps, schema_editor):
+    # use the creation time of the sent email, when there is one; otherwise
+    # left unknown
+    Notification = apps.get_model("unicef_notification", "Notification")
+    Email = apps.get_model("post_office", "Email")
+    Notification.objects.filter(sent_email__isnull=False).update(
+        created=Subquery(
+            Email.objects.filter(pk=OuterRef("sent_email_id")).values("created")[:1]
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    # the indexes are built concurrently, so large tables stay writable
+    atomic = False
+
+    dependencies = [
+        ("unicef_notification", "0006_send_checkpoint"),
+    ]
+
+    operations = [
+        # added without auto_now_add, which would date the existing rows now
+        migrations.AddField(
+            model_name="notification",
+            name="created",
+            field=models.DateTimeField(null=True, verbose_name="Created"),
+        ),
+        migrations.RunPython(set_created, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name="notification",
+            name="created",
+            field=models.DateTimeField(
+                auto_now_add=True, null=True, verbose_name="Created"
+            ),
+        ),
+        migrations.AlterField(
+            model_name="notification",
+            name="status",
+            field=models.CharField(
+                choices=[
+                    ("draft", "Draft"),
+                    ("scheduled", "Scheduled"),
+                    ("pending", "Pending"),
+                    ("sent", "Sent"),
+                    ("failed", "Failed"),
+                    ("cancelled", "Cancelled"),
+                ],
+                default="draft",
+                max_length=20,
+                verbose_name="Status",
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="notification",
+            index=models.Index(
+                fields=["template_name", "-id"], name="notification_template_idx"
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="notification",
+            index=models.Index(
+                fields=["status", "-id"], name="notification_status_idx"
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="notification",
+            index=models.Index(fields=["created"], name="notification_created_idx"),
+        ),
+        AddIndexConcurrently(
+            model_name="notification",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["recipients"], name="notification_recipients_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("unicef_notification", "0007_notification_admin_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="notification",
+            name="language",
+            field=models.CharField(
+                blank=True, default="", max_length=12, verbose_name="Language"
+            ),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:50
+
+from django.db import migrations
+
+# Notifies unicef_notification.wakeup.CHANNEL when a notification becomes
+# pending. Notifications with the same payload are sent once per transaction,
+# so bulk inserts wake workers once.
+CREATE_TRIGGER = """
+CREATE OR REPLACE FUNCTION unicef_notification_notify_pending() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify('unicef_notification_pending', '');
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER unicef_notification_pending_insert
+    AFTER INSERT ON unicef_notification_notification
+    FOR EACH ROW WHEN (NEW.status = 'pending')
+    EXECUTE PROCEDURE unicef_notification_notify_pending();
+
+CREATE TRIGGER unicef_notification_pending_update
+    AFTER UPDATE OF status ON unicef_notification_notification
+    FOR EACH ROW WHEN (NEW.status = 'pending' AND OLD.status <> 'pending')
+    EXECUTE PROCEDURE unicef_notification_notify_pending();
+"""
+
+DROP_TRIGGER = """
+DROP TRIGGER IF EXISTS unicef_notification_pending_update ON unicef_notification_notification;
+DROP TRIGGER IF EXISTS unicef_notification_pending_insert ON unicef_notification_notification;
+DROP FUNCTION IF EXISTS unicef_notification_notify_pending();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("unicef_notification", "0008_notification_language"),
+    ]
+
+    operations = [
+        migrations.RunSQL(CREATE_TRIGGER, DROP_TRIGGER),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("unicef_notification", "0009_notification_pending_trigger"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="notification",
+            name="lease_expires",
+            field=models.DateTimeField(
+                blank=True, null=True, verbose_name="Lease Expires"
+            ),
+        ),
+        migrations.AddField(
+            model_name="notification",
+            name="leased_by",
+            field=models.CharField(
+                blank=True, default="", max_length=255, verbose_name="Leased By"
+            ),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("unicef_notification", "0010_notification_lease"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TemplateSync",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "name",
+                    models.CharField(max_length=255, unique=True, verbose_name="Name"),
+                ),
+                (
+                    "content_hash",
+                    models.CharField(max_length=64, verbose_name="Content Hash"),
+                ),
+                (
+                    "modified",
+                    models.DateTimeField(auto_now=True, verbose_name="Modified"),
+                ),
+            ],
+        ),
+    ]
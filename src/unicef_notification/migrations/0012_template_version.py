@@ -0,0 +1,76 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:54
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("unicef_notification", "0011_template_sync"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TemplateVersion",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=255, verbose_name="Name")),
+                (
+                    "language",
+                    models.CharField(
+                        blank=True, default="", max_length=12, verbose_name="Language"
+                    ),
+                ),
+                (
+                    "content_hash",
+                    models.CharField(max_length=64, verbose_name="Content Hash"),
+                ),
+                (
+                    "subject",
+                    models.TextField(blank=True, default="", verbose_name="Subject"),
+                ),
+                (
+                    "content",
+                    models.TextField(blank=True, default="", verbose_name="Content"),
+                ),
+                (
+                    "html_content",
+                    models.TextField(
+                        blank=True, default="", verbose_name="HTML Content"
+                    ),
+                ),
+                (
+                    "created",
+                    models.DateTimeField(auto_now_add=True, verbose_name="Created"),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("name", "language", "content_hash"),
+                        name="template_version_content_unique",
+                    )
+                ],
+            },
+        ),
+        migrations.AddField(
+            model_name="notification",
+            name="template_version",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                to="unicef_notification.templateversion",
+                verbose_name="Template Version",
+            ),
+        ),
+    ]
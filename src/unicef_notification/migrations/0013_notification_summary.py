@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("unicef_notification", "0012_template_version"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="NotificationSummary",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("day", models.DateField(verbose_name="Day")),
+                (
+                    "template_name",
+                    models.CharField(
+                        blank=True, max_length=255, verbose_name="Template Name"
+                    ),
+                ),
+                ("method_type", models.CharField(max_length=255, verbose_name="Type")),
+                ("status", models.CharField(max_length=10, verbose_name="Status")),
+                ("count", models.PositiveIntegerField(default=0, verbose_name="Count")),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("day", "template_name", "method_type", "status"),
+                        name="notification_summary_unique",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:00
+
+from django.db import migrations
+
+from unicef_notification import indexes
+
+
+# GIN index of template_data, for Notification.objects.about() queries. It is
+# only created if UNICEF_NOTIFICATION_TEMPLATE_DATA_INDEX is set when
+# migrating, as it slows down inserts; later, by the template_data_index
+# command. It is built concurrently, so large tables stay writable.
+def create_index(apps, schema_editor):
+    if indexes.is_enabled():
+        indexes.create_template_data_index(schema_editor.connection)
+
+
+def drop_index(apps, schema_editor):
+    indexes.drop_template_data_index(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ("unicef_notification", "0013_notification_summary"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+import unicef_notification.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("unicef_notification", "0015_notification_preference"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="NotificationArchive",
+            fields=[
+                (
+                    "notification",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="archive",
+                        serialize=False,
+                        to="unicef_notification.notification",
+                        verbose_name="Notification",
+                    ),
+                ),
+                ("data", models.BinaryField(verbose_name="Data")),
+                (
+                    "created",
+                    models.DateTimeField(auto_now_add=True, verbose_name="Created"),
+                ),
+            ],
+        ),
+        migrations.AddField(
+            model_name="notification",
+            name="archived",
+            field=models.BooleanField(default=False, verbose_name="Archived"),
+        ),
+        migrations.AlterField(
+            model_name="notification",
+            name="html_message",
+            field=unicef_notification.fields.ArchivedTextField(blank=True, default=""),
+        ),
+        migrations.AlterField(
+            model_name="notification",
+            name="template_data",
+            field=unicef_notification.fields.ArchivedJSONField(
+                blank=True, null=True, verbose_name="Template Data"
+            ),
+        ),
+        migrations.AlterField(
+            model_name="notification",
+            name="text_message",
+            field=unicef_notification.fields.ArchivedTextField(blank=True, default=""),
+        ),
+    ]
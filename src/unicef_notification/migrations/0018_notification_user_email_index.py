@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:25
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.db import migrations
+
+# index of the lowercased email of users, for the lookups of the preferences
+# of users by address (see preferences.load_preferences); it is built
+# concurrently, so large user tables stay writable.
+INDEX_NAME = "notification_user_email_idx"
+
+
+def create_index(apps, schema_editor):
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    try:
+        email = User._meta.get_field("email")
+    except FieldDoesNotExist:
+        return
+    quote_name = schema_editor.quote_name
+    schema_editor.execute(
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS {} ON {} (LOWER({}))".format(
+            quote_name(INDEX_NAME), quote_name(User._meta.db_table), quote_name(email.column)
+        )
+    )
+
+
+def drop_index(apps, schema_editor):
+    schema_editor.execute(
+        "DROP INDEX CONCURRENTLY IF EXISTS {}".format(schema_editor.quote_name(INDEX_NAME))
+    )
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ("unicef_notification", "0017_notification_status_suppressed"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
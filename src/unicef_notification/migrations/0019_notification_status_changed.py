@@ -0,0 +1,68 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:20
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+# Sets Notification.status_changed when a notification is created, or its
+# status changes, whether by save(), bulk_update(), update() or COPY; other
+# updates keep it, even if they write a stale value.
+CREATE_TRIGGER = """
+CREATE OR REPLACE FUNCTION unicef_notification_status_changed() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' OR NEW.status IS DISTINCT FROM OLD.status THEN
+        NEW.status_changed := statement_timestamp();
+    ELSE
+        NEW.status_changed := OLD.status_changed;
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER unicef_notification_status_changed
+    BEFORE INSERT OR UPDATE ON unicef_notification_notification
+    FOR EACH ROW EXECUTE PROCEDURE unicef_notification_status_changed();
+"""
+
+DROP_TRIGGER = """
+DROP TRIGGER IF EXISTS unicef_notification_status_changed ON unicef_notification_notification;
+DROP FUNCTION IF EXISTS unicef_notification_status_changed();
+"""
+
+
+class Migration(migrations.Migration):
+
+    # the index is built concurrently, so large tables stay writable
+    atomic = False
+
+    dependencies = [
+        ("unicef_notification", "0018_notification_user_email_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="notification",
+            name="status_changed",
+            field=models.DateTimeField(
+                blank=True, editable=False, null=True, verbose_name="Status Changed"
+            ),
+        ),
+        migrations.AddField(
+            model_name="notificationsummary",
+            name="summarized",
+            field=models.DateTimeField(
+                blank=True, null=True, verbose_name="Summarized"
+            ),
+        ),
+        migrations.AlterField(
+            model_name="notificationsummary",
+            name="status",
+            field=models.CharField(max_length=20, verbose_name="Status"),
+        ),
+        migrations.RunSQL(CREATE_TRIGGER, DROP_TRIGGER),
+        AddIndexConcurrently(
+            model_name="notification",
+            index=models.Index(
+                fields=["status_changed"], name="notification_changed_idx"
+            ),
+        ),
+    ]
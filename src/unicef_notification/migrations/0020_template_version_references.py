@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("unicef_notification", "0019_notification_status_changed"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="templateversion",
+            name="references",
+            field=models.JSONField(blank=True, default=dict, verbose_name="References"),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:30
+
+from django.db import migrations, models
+
+import unicef_notification.models
+
+
+def set_priority(apps, schema_editor):
+    # notifications without priority were sent with post_office's default one,
+    # but were queued after all the others
+    Notification = apps.get_model("unicef_notification", "Notification")
+    Notification.objects.filter(priority__isnull=True).update(
+        priority=unicef_notification.models.get_default_priority()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("unicef_notification", "0020_template_version_references"),
+    ]
+
+    operations = [
+        migrations.RunPython(set_priority, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name="notification",
+            name="priority",
+            field=models.PositiveSmallIntegerField(
+                choices=[(0, "low"), (1, "medium"), (2, "high"), (3, "now")],
+                default=unicef_notification.models.get_default_priority,
+                verbose_name="Priority",
+            ),
+        ),
+    ]
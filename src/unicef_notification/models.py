@@ -1,25 +1,143 @@
+import datetime
 import json
 import logging
+import zlib
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex
 from django.core.exceptions import ValidationError
-from django.db import models
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, models, transaction
+from django.db.models import Count, F, Max, Q, Sum
+from django.db.models.functions import Mod, TruncDate
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
 from django.utils.translation import gettext as _
 
 from model_utils import Choices
 from post_office import mail
-from post_office.models import EmailTemplate  # noqa used as a wrapper
+from post_office.connections import connections
+from post_office.models import Email, EmailTemplate, PRIORITY, STATUS  # noqa used as a wrapper
+from post_office.signals import email_queued
+from post_office.utils import get_email_template, parse_priority
 
-from unicef_notification import validations
+from unicef_notification import preferences, suppression, validations
+from unicef_notification.fields import ArchivedJSONField, ArchivedTextField, row_values
+from unicef_notification.profiling import profiled
+from unicef_notification.rendering import get_render_cache, render_email_template
+from unicef_notification.routers import get_replica_database
 from unicef_notification.utils import serialize_dict
+from unicef_notification.versions import get_references_engine, get_template_version_id
 
 logger = logging.getLogger(__name__)
 
 
+def get_default_priority():
+    """post_office's default priority, as stored in Notification.priority"""
+    return parse_priority(None)
+
+
+class NotificationQuerySet(models.QuerySet):
+    def pending(self):
+        return self.filter(status=Notification.STATUS.pending)
+
+    def claimable(self):
+        """Pending notifications not leased by a worker, or whose lease expired"""
+        return self.pending().filter(
+            Q(lease_expires__isnull=True) | Q(lease_expires__lt=timezone.now())
+        )
+
+    def shard(self, index, count):
+        """Notifications of one of count shards, by id"""
+        return self.alias(shard=Mod("id", count)).filter(shard=index)
+
+    def due(self):
+        return self.filter(
+            status=Notification.STATUS.scheduled,
+            send_at__lte=timezone.now(),
+        )
+
+    def queue_order(self):
+        """Highest priority first, then oldest first"""
+        return self.order_by(F("priority").desc(nulls_last=True), "id")
+
+    def update_in_batches(self, batch_size=None, **kwargs):
+        """
+        Update the notifications by ranges of ids holding batch_size of them,
+        each in its own query, rather than all at once; return the number of
+        notifications updated
+        """
+        if batch_size is None:
+            return self.update(**kwargs)
+        count = 0
+        last = None
+        while True:
+            qs = self if last is None else self.filter(pk__gt=last)
+            pks = list(qs.order_by("pk").values_list("pk", flat=True)[:batch_size])
+            if not pks:
+                return count
+            count += qs.filter(pk__lte=pks[-1]).update(**kwargs)
+            last = pks[-1]
+
+    def resend(self, batch_size=None):
+        """Queue the notifications to be sent (again) by send_notifications"""
+        return self.update_in_batches(batch_size, status=Notification.STATUS.pending)
+
+    def cancel(self, batch_size=None):
+        """Cancel the notifications that are queued or scheduled"""
+        return self.filter(
+            status__in=[Notification.STATUS.pending, Notification.STATUS.scheduled]
+        ).update_in_batches(batch_size, status=Notification.STATUS.cancelled)
+
+    def reporting(self):
+        """
+        Read the notifications from the replica database, if configured;
+        for history and reporting only, see unicef_notification.routers
+        """
+        replica = get_replica_database()
+        return self.using(replica) if replica else self
+
+    def addressed_to(self, address):
+        """
+        Notifications with address among their recipients, whether they were
+        sent or not; can use notification_recipients_idx
+        """
+        return self.filter(recipients__contains=[address])
+
+    def copy_create(self, notifications, batch_size=10000):
+        """
+        Create notifications in bulk through postgres COPY, streaming them
+        from an iterable; return their ids. See unicef_notification.ingest.
+        """
+        from unicef_notification.ingest import copy_notifications
+
+        return copy_notifications(notifications, batch_size=batch_size, using=self.db)
+
+    def about(self, obj, key):
+        """
+        Notifications whose template_data holds model instance obj, as
+        serialized by serialize_dict, under key, or under any of the keys if
+        key is a list. Each key is a containment query, which can use
+        notification_template_data_idx.
+        """
+        keys = [key] if isinstance(key, str) else list(key)
+        if not keys:
+            return self.none()
+        value = {
+            "model": obj._meta.label_lower,
+            "pk": json.loads(DjangoJSONEncoder().encode(obj.pk)),
+        }
+        query = Q()
+        for key in keys:
+            query |= Q(template_data__contains={key: value})
+        return self.filter(query)
+
+
 class Notification(models.Model):
     """
     Represents a notification instance from sender to recipients
@@ -30,6 +148,20 @@ class Notification(models.Model):
         (TYPE_EMAIL, "Email"),
     )
 
+    # draft: saved but not queued for sending
+    # scheduled: to be queued by the schedule_notifications command at send_at
+    # pending: queued, waiting to be sent by the send_notifications command
+    # suppressed: not sent, as all its addresses are suppressed or opted out
+    STATUS = Choices(
+        ("draft", _("Draft")),
+        ("scheduled", _("Scheduled")),
+        ("pending", _("Pending")),
+        ("sent", _("Sent")),
+        ("failed", _("Failed")),
+        ("cancelled", _("Cancelled")),
+        ("suppressed", _("Suppressed")),
+    )
+
     method_type = models.CharField(
         verbose_name=_("Type"),
         max_length=255,
@@ -52,6 +184,15 @@ class Notification(models.Model):
     # from_address can be used as the notification from address if sender is
     # not a user with an email address.
     from_address = models.CharField(max_length=255, null=True, blank=True)
+    # sender_email is the resolved "From" address, stored when the
+    # notification is first saved, so that sending it does not need
+    # to fetch the sender.
+    sender_email = models.CharField(
+        verbose_name=_("Sender Email"),
+        max_length=255,
+        blank=True,
+        default="",
+    )
     recipients = ArrayField(
         models.CharField(max_length=255), blank=True, verbose_name=_("Recipients")
     )
@@ -66,6 +207,57 @@ class Notification(models.Model):
         blank=True,
         verbose_name=_("Sent Recipients"),
     )
+    status = models.CharField(
+        verbose_name=_("Status"),
+        max_length=20,
+        choices=STATUS,
+        default=STATUS.draft,
+    )
+    created = models.DateTimeField(
+        verbose_name=_("Created"),
+        auto_now_add=True,
+        null=True,
+    )
+    # time of the last change of status, or of the creation; set by a database
+    # trigger, for summarize_notifications, however the status is changed
+    status_changed = models.DateTimeField(
+        verbose_name=_("Status Changed"),
+        null=True,
+        blank=True,
+        editable=False,
+    )
+    # post_office priority of the email, post_office's default priority
+    # unless given. Pending notifications are sent highest priority first.
+    priority = models.PositiveSmallIntegerField(
+        verbose_name=_("Priority"),
+        choices=Email.PRIORITY_CHOICES,
+        default=get_default_priority,
+    )
+    # set while a send_notifications worker sends the notification
+    lease_expires = models.DateTimeField(
+        verbose_name=_("Lease Expires"),
+        null=True,
+        blank=True,
+    )
+    leased_by = models.CharField(
+        verbose_name=_("Leased By"),
+        max_length=255,
+        blank=True,
+        default="",
+    )
+    send_at = models.DateTimeField(
+        verbose_name=_("Send At"),
+        null=True,
+        blank=True,
+    )
+    # addresses removed from recipients and cc because they are suppressed,
+    # or opted out (see NotificationPreference)
+    suppressed_recipients = ArrayField(
+        models.CharField(max_length=255),
+        default=list,
+        blank=True,
+        verbose_name=_("Suppressed Recipients"),
+    )
     # template_name has to be the name of an existing EmailTemplate object.
     # validate_template_name checks that.
     template_name = models.CharField(
@@ -75,8 +267,23 @@ class Notification(models.Model):
         blank=True,
         default="",
     )
+    # language of the EmailTemplate variant to use, "" for the default one
+    language = models.CharField(
+        verbose_name=_("Language"),
+        max_length=12,
+        blank=True,
+        default="",
+    )
+    # immutable version of the EmailTemplate the notification was sent with
+    template_version = models.ForeignKey(
+        "TemplateVersion",
+        verbose_name=_("Template Version"),
+        null=True,
+        blank=True,
+        on_delete=models.PROTECT,
+    )
     # template_data is the context for rendering any templates.
-    template_data = models.JSONField(
+    template_data = ArchivedJSONField(
         verbose_name=_("Template Data"),
         null=True,
         blank=True,
@@ -93,10 +300,15 @@ class Notification(models.Model):
     subject = models.TextField(default="", blank=True)
     # Content of template used to render plain text message
     # if template_name not specified.
-    text_message = models.TextField(default="", blank=True)
+    text_message = ArchivedTextField(default="", blank=True)
     # Content of template used to render HTML message
     # if template_name not specified.
-    html_message = models.TextField(default="", blank=True)
+    html_message = ArchivedTextField(default="", blank=True)
+    # text_message, html_message and template_data were moved to
+    # NotificationArchive by archive_notifications
+    archived = models.BooleanField(verbose_name=_("Archived"), default=False)
+
+    objects = NotificationQuerySet.as_manager()
 
     def __str__(self):
         return "{} Notification from {}: {}".format(
@@ -104,15 +316,30 @@ class Notification(models.Model):
         )
 
     def __init__(self, *args, **kwargs):
-        template_data = kwargs.get("template_data", {})
+        if "template_data" in kwargs:
+            kwargs["template_data"] = self.serializable(kwargs["template_data"])
+        super().__init__(*args, **kwargs)
+
+    @staticmethod
+    def serializable(template_data):
+        """Return template_data, with its model instances serialized if needed"""
         # Before trying to serialize template_data, we might need to
         # make it serializable
         try:
             json.dumps(template_data)
         except TypeError:
             assert isinstance(template_data, dict)
-            kwargs["template_data"] = serialize_dict(template_data)
-        super().__init__(*args, **kwargs)
+            return serialize_dict(template_data)
+        return template_data
+
+    def clean_fields(self, exclude=None):
+        super().clean_fields(exclude=exclude)
+        # the variant of the template in the language has to exist too
+        if self.template_name and self.language and "template_name" not in (exclude or ()):
+            try:
+                validations.validate_template_name(self.template_name, self.language)
+            except ValidationError as e:
+                raise ValidationError({"language": e.messages})
 
     def clean(self):
         if (
@@ -122,9 +349,10 @@ class Notification(models.Model):
                 "Notification cannot have both a template name, "
                 "and a text_message or html_message or subject"
             )
+        # the content of a notification that is not sent is not rendered
         if not (
             self.text_message or self.html_message or self.template_name or self.subject
-        ):
+        ) and not self.is_suppressed:
             raise ValidationError(
                 "Notification must have template name or text_message or html_message or subject."
             )
@@ -135,49 +363,669 @@ class Notification(models.Model):
         # if not (len(self.cc) + len(self.recipients)):
         #     raise ValidationError("Notification must have at least one recipient or cc address.")
 
-    def send_notification(self):
+    def send_notification(self, commit=True, disconnect_after_delivery=True):
         """
         Dispatch notification based on type.
+
+        Return True if the notification was sent. If commit is False,
+        the sent status is not saved. If disconnect_after_delivery is False,
+        the email backend connection is left open for the next notification.
         """
         if self.method_type == self.TYPE_EMAIL:
-            self.send_mail()
+            return self.send_mail(
+                commit=commit, disconnect_after_delivery=disconnect_after_delivery
+            )
         else:
             # for future notification methods
             raise ValueError("Unknown notification type: %s" % self.method_type)
 
-    def send_mail(self):
+    def save(self, *args, **kwargs):
+        if not self.sender_email:
+            self.sender_email = self.get_sender_email()
+        super().save(*args, **kwargs)
+        unarchived = self.__dict__.pop("_unarchived", set())
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None:
+            # the values assigned but not saved still replace the archived ones
+            if unarchived - set(update_fields):
+                self._unarchived = unarchived - set(update_fields)
+            unarchived &= set(update_fields)
+        if unarchived and self.archived:
+            NotificationArchive.forget(self, unarchived)
+
+    def refresh_from_db(self, *args, **kwargs):
+        # copy the values of the row, not the archived ones
+        with row_values():
+            super().refresh_from_db(*args, **kwargs)
+
+    def get_sender_email(self):
+        """
+        Resolve the "From" address: the sender's email if the sender is a User,
+        otherwise from_address, otherwise settings.DEFAULT_FROM_EMAIL
+        """
         User = get_user_model()
 
         if isinstance(self.sender, User):
-            sender = self.sender.email
+            return self.sender.email
         elif self.from_address:
-            sender = self.from_address
-        else:
-            sender = settings.DEFAULT_FROM_EMAIL
+            return self.from_address
+        return settings.DEFAULT_FROM_EMAIL
+
+    @property
+    def is_suppressed(self):
+        """Whether all the addresses of the notification were removed as suppressed"""
+        return bool(self.suppressed_recipients) and not (self.recipients or self.cc)
+
+    def get_archived_data(self):
+        """Return the fields of the notification kept in its NotificationArchive"""
+        if "_archived_data" not in self.__dict__:
+            data = (
+                NotificationArchive.objects.filter(notification=self.pk)
+                .values_list("data", flat=True)
+                .first()
+            )
+            self._archived_data = NotificationArchive.decompress(data) if data else {}
+        return self._archived_data
+
+    @classmethod
+    def send_bulk(cls, notifications, lease_expires=None, worker=""):
+        """
+        Dispatch notifications, saving the sent status of all of them
+        with a single query.
+
+        Emails sent immediately share one connection to the email backend
+        (per thread), reopened only after a delivery error.
+
+        With lease_expires, the notifications leased by worker are only
+        dispatched until the lease expires, the others being left for the
+        next worker, and their status is only saved if they are still leased
+        by worker, rather than claimed again by another one.
+        """
+        dispatched = []
+        sent = []
+        try:
+            for notification in notifications:
+                if lease_expires is not None and timezone.now() >= lease_expires:
+                    logger.warning(
+                        "Lease of %s expired, %d notifications left to send",
+                        worker,
+                        len(notifications) - len(dispatched),
+                    )
+                    break
+                dispatched.append(notification)
+                if notification.send_notification(
+                    commit=False, disconnect_after_delivery=False
+                ):
+                    sent.append(notification)
+        finally:
+            connections.close()
+        if dispatched:
+            qs = cls.objects.all()
+            if lease_expires is not None:
+                qs = qs.filter(leased_by=worker, lease_expires=lease_expires)
+            updated = qs.bulk_update(
+                dispatched, ["status", "sent_recipients", "sent_email", "template_version"]
+            )
+            # bulk_update returns the number of rows updated from Django 4.0
+            if updated is not None and updated < len(dispatched):
+                logger.warning(
+                    "%d notifications sent by %s were claimed again by another worker",
+                    len(dispatched) - updated,
+                    worker,
+                )
+        return sent
+
+    @classmethod
+    def send_pending(cls, batch_size=100, priorities=None, shard=None, lease=None, worker=""):
+        """
+        Claim a batch of pending notifications, highest priority and
+        oldest first, and dispatch them.
+
+        If priorities is given, only notifications with those priorities
+        are claimed. If shard is given, as a tuple (index, count), only
+        notifications of that shard are claimed.
+
+        Without lease, the batch stays locked while it is sent; rows locked
+        by other workers are skipped. With lease, a number of seconds, the
+        batch is marked as leased by worker in a short transaction and sent
+        afterwards; the notifications of a worker that crashes, or that are
+        not sent before the lease expires, are claimed again once it expires.
+
+        Return the number of notifications dispatched.
+        """
+        qs = cls.objects.claimable()
+        if priorities:
+            qs = qs.filter(priority__in=priorities)
+        if shard is not None:
+            qs = qs.shard(*shard)
+        qs = qs.queue_order().select_for_update(skip_locked=True)
+
+        if lease is None:
+            with transaction.atomic():
+                batch = list(qs[:batch_size])
+                cls.send_bulk(batch)
+            return len(batch)
+
+        with transaction.atomic():
+            batch = list(qs[:batch_size])
+            lease_expires = timezone.now() + datetime.timedelta(seconds=lease)
+            for notification in batch:
+                notification.lease_expires = lease_expires
+                notification.leased_by = worker
+            cls.objects.filter(pk__in=[n.pk for n in batch]).update(
+                lease_expires=lease_expires, leased_by=worker
+            )
+        cls.send_bulk(batch, lease_expires=lease_expires, worker=worker)
+        return len(batch)
+
+    @classmethod
+    def queue_scheduled(cls, batch_size=1000):
+        """
+        Queue a batch of scheduled notifications that are due, oldest
+        send_at first, for the send_notifications command.
+
+        Rows locked by other schedulers are skipped.
+        Return the number of notifications queued.
+        """
+        with transaction.atomic():
+            pks = list(
+                cls.objects.due()
+                .order_by("send_at")
+                .select_for_update(skip_locked=True)
+                .values_list("pk", flat=True)[:batch_size]
+            )
+            cls.objects.filter(pk__in=pks).update(status=cls.STATUS.pending)
+        return len(pks)
+
+    @profiled("send_mail")
+    def send_mail(self, commit=True, disconnect_after_delivery=True):
+        if self.is_suppressed:
+            # nobody left to send to
+            self.status = self.STATUS.suppressed
+            if commit:
+                self.save()
+            return False
+
+        sender = self.sender_email or self.get_sender_email()
 
         if isinstance(self.template_data, str):
             template_data = json.loads(self.template_data)
         else:
             template_data = self.template_data
 
+        render_cache = get_render_cache()
+        rendered = None
+        template = self.template_name
         try:
-            email = mail.send(
+            if template:
+                template = get_email_template(template, self.language)
+                self.template_version_id = get_template_version_id(template)
+                if render_cache is not None:
+                    rendered = render_cache.render(template, template_data)
+            kwargs = dict(
                 recipients=self.recipients,
                 cc=self.cc,
                 sender=sender,
-                template=self.template_name,
+                template=template,
                 context=template_data,
                 subject=self.subject,  # actually template text
                 message=self.text_message,  # actually template text
                 html_message=self.html_message,  # actually template text
+                priority=self.priority,
+                language=self.language,
             )
+            if rendered is None and (
+                disconnect_after_delivery or parse_priority(self.priority) != PRIORITY.now
+            ):
+                email = mail.send(**kwargs)
+            else:
+                email = self._dispatch_mail(
+                    rendered=rendered, disconnect_after_delivery=disconnect_after_delivery, **kwargs
+                )
         except Exception:
             # log an exception, with traceback
             logger.exception("Failed to send mail.")
-        else:
-            self.sent_recipients = self.recipients + self.cc
-            self.sent_email = email
+            self.status = self.STATUS.failed
+            if commit:
+                self.save()
+            return False
+        self.sent_email = email
+        if email.status == STATUS.failed:
+            # dispatched at once, and failed; logged by post_office
+            self.status = self.STATUS.failed
+            if commit:
+                self.save()
+            return False
+        self.status = self.STATUS.sent
+        self.sent_recipients = self.recipients + self.cc
+        if commit:
             self.save()
+        return True
+
+    @staticmethod
+    def _dispatch_mail(priority, rendered=None, disconnect_after_delivery=False, **kwargs):
+        """
+        Send the email with mail.send, but dispatch it here, to leave the
+        backend connection open for the next email unless
+        disconnect_after_delivery, and with the subject, text and HTML
+        content already rendered, if given.
+        """
+        priority = parse_priority(priority)
+        # without commit, mail.send validates and builds the email, without
+        # saving or dispatching it; it refuses to do so for priority now.
+        # With render_on_delivery, it leaves the template to be rendered.
+        email = mail.send(
+            priority=PRIORITY.high,
+            commit=False,
+            render_on_delivery=rendered is not None,
+            **kwargs,
+        )
+        email.priority = priority
+        email.status = None if priority == PRIORITY.now else STATUS.queued
+        if rendered is not None:
+            email.subject, email.message, email.html_message = rendered
+            # sent as is, not rendered again on delivery
+            email.context = None
+        email.save()
+        if priority != PRIORITY.now:
+            email_queued.send(sender=Email, emails=[email])
+        elif email.dispatch(disconnect_after_delivery=disconnect_after_delivery) == STATUS.failed:
+            # reconnect for the next email
+            connections.close()
+        return email
 
     class Meta:
         app_label = 'unicef_notification'
+        indexes = [
+            # serves the send_notifications queue scan
+            models.Index(
+                F("priority").desc(nulls_last=True),
+                "id",
+                name="notification_queue_idx",
+                condition=Q(status="pending"),
+            ),
+            # serves the schedule_notifications scan for due notifications
+            models.Index(
+                fields=["send_at"],
+                name="notification_scheduled_idx",
+                condition=Q(status="scheduled"),
+            ),
+            # admin filters and recipient search
+            models.Index(fields=["template_name", "-id"], name="notification_template_idx"),
+            models.Index(fields=["status", "-id"], name="notification_status_idx"),
+            models.Index(fields=["created"], name="notification_created_idx"),
+            models.Index(fields=["status_changed"], name="notification_changed_idx"),
+            GinIndex(fields=["recipients"], name="notification_recipients_idx"),
+        ]
+
+
+class SuppressedAddressQuerySet(models.QuerySet):
+    def active(self):
+        return self.filter(Q(expires__isnull=True) | Q(expires__gt=timezone.now()))
+
+
+class SuppressedAddress(models.Model):
+    """
+    An email address that notifications are not sent to
+    """
+
+    REASON = Choices(
+        ("bounced", _("Hard bounce")),
+        ("complained", _("Complaint")),
+        ("unsubscribed", _("Unsubscribed")),
+        ("other", _("Other")),
+    )
+
+    # stored normalized, see suppression.normalize_address
+    address = models.CharField(verbose_name=_("Address"), max_length=255, unique=True)
+    reason = models.CharField(
+        verbose_name=_("Reason"),
+        max_length=20,
+        choices=REASON,
+        default=REASON.other,
+    )
+    # the address is no longer suppressed after expires, if set
+    expires = models.DateTimeField(verbose_name=_("Expires"), null=True, blank=True)
+    created = models.DateTimeField(verbose_name=_("Created"), auto_now_add=True)
+
+    objects = SuppressedAddressQuerySet.as_manager()
+
+    class Meta:
+        app_label = 'unicef_notification'
+        verbose_name_plural = _("Suppressed Addresses")
+
+    def __str__(self):
+        return self.address
+
+    def save(self, *args, **kwargs):
+        self.address = suppression.normalize_address(self.address)
+        super().save(*args, **kwargs)
+
+
+@receiver(post_save, sender=SuppressedAddress)
+@receiver(post_delete, sender=SuppressedAddress)
+def reload_suppressed_addresses(sender, **kwargs):
+    suppression.clear()
+
+
+class NotificationPreference(models.Model):
+    """
+    Opt-in or opt-out of a user, or of an address, from the notifications
+    of a template, of a group of templates, or of all templates
+    """
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        verbose_name=_("User"),
+        null=True,
+        blank=True,
+        on_delete=models.CASCADE,
+        related_name="notification_preferences",
+    )
+    # stored normalized, see suppression.normalize_address; set if user is not
+    address = models.CharField(verbose_name=_("Address"), max_length=255, blank=True, default="")
+    # template of the preference, or else group of templates (the group of
+    # the notification definition), or else all templates if both are blank
+    template_name = models.CharField(verbose_name=_("Template Name"), max_length=255, blank=True, default="")
+    template_group = models.CharField(verbose_name=_("Template Group"), max_length=255, blank=True, default="")
+    method_type = models.CharField(
+        verbose_name=_("Type"),
+        max_length=255,
+        choices=Notification.TYPE_CHOICES,
+        default=Notification.TYPE_EMAIL,
+    )
+    # False to opt out
+    enabled = models.BooleanField(verbose_name=_("Enabled"), default=False)
+    modified = models.DateTimeField(verbose_name=_("Modified"), auto_now=True)
+
+    class Meta:
+        app_label = 'unicef_notification'
+        indexes = [
+            models.Index(fields=["address"], name="notification_pref_address_idx"),
+        ]
+
+    def __str__(self):
+        return "{} {}".format(
+            self.address or self.user, self.template_name or self.template_group or "*"
+        )
+
+    def clean(self):
+        if bool(self.user_id) == bool(self.address):
+            raise ValidationError(_("Set either a user or an address."))
+        if self.template_name and self.template_group:
+            raise ValidationError(_("Set either a template name or a template group."))
+
+    def save(self, *args, **kwargs):
+        self.address = suppression.normalize_address(self.address) if self.address else ""
+        super().save(*args, **kwargs)
+
+
+@receiver(post_save, sender=NotificationPreference)
+@receiver(post_delete, sender=NotificationPreference)
+def reload_preferences(sender, **kwargs):
+    preferences.clear()
+
+
+class NotificationArchive(models.Model):
+    """
+    Compressed text_message, html_message and template_data of an old
+    notification, moved out of the notification table by archive_notifications
+    """
+
+    ARCHIVED_FIELDS = ("text_message", "html_message", "template_data")
+
+    notification = models.OneToOneField(
+        Notification,
+        verbose_name=_("Notification"),
+        primary_key=True,
+        on_delete=models.CASCADE,
+        related_name="archive",
+    )
+    # zlib compressed JSON of the archived fields
+    data = models.BinaryField(verbose_name=_("Data"))
+    created = models.DateTimeField(verbose_name=_("Created"), auto_now_add=True)
+
+    class Meta:
+        app_label = 'unicef_notification'
+
+    def __str__(self):
+        return str(self.notification_id)
+
+    @classmethod
+    def forget(cls, notification, fields):
+        """Remove fields, saved with new values, from the archive of notification"""
+        data = {
+            name: value
+            for name, value in notification.get_archived_data().items()
+            if name not in fields
+        }
+        cls.objects.filter(notification=notification.pk).update(data=cls.compress(data))
+        notification._archived_data = data
+
+    @staticmethod
+    def compress(data):
+        return zlib.compress(json.dumps(data, cls=DjangoJSONEncoder).encode("utf-8"))
+
+    @staticmethod
+    def decompress(data):
+        return json.loads(zlib.decompress(data).decode("utf-8"))
+
+    @classmethod
+    def archive(cls, before, batch_size=1000):
+        """
+        Move the archived fields of the notifications created before, and done
+        with (sent, failed or cancelled), to the archive, batch_size
+        notifications per transaction. Return the number of notifications.
+        """
+        total = 0
+        last_id = 0
+        while True:
+            with transaction.atomic():
+                rows = list(
+                    Notification.objects.filter(
+                        id__gt=last_id,
+                        created__lt=before,
+                        archived=False,
+                        status__in=[
+                            Notification.STATUS.sent,
+                            Notification.STATUS.failed,
+                            Notification.STATUS.cancelled,
+                        ],
+                    )
+                    .order_by("id")
+                    .select_for_update(skip_locked=True)
+                    .values_list("id", *cls.ARCHIVED_FIELDS)[:batch_size]
+                )
+                if not rows:
+                    break
+                last_id = rows[-1][0]
+                cls.objects.bulk_create(
+                    cls(
+                        notification_id=row[0],
+                        data=cls.compress(dict(zip(cls.ARCHIVED_FIELDS, row[1:]))),
+                    )
+                    for row in rows
+                )
+                Notification.objects.filter(id__in=[row[0] for row in rows]).update(
+                    archived=True, text_message="", html_message="", template_data=None
+                )
+            total += len(rows)
+        return total
+
+
+class SendCheckpoint(models.Model):
+    """
+    Progress of a send_notification_to_queryset run
+    """
+
+    name = models.CharField(verbose_name=_("Name"), max_length=255, unique=True)
+    # primary key of the last object notified
+    last_pk = models.CharField(verbose_name=_("Last Primary Key"), max_length=255, blank=True, default="")
+    count = models.PositiveIntegerField(verbose_name=_("Notifications Created"), default=0)
+    modified = models.DateTimeField(verbose_name=_("Modified"), auto_now=True)
+
+    class Meta:
+        app_label = 'unicef_notification'
+
+    def __str__(self):
+        return self.name
+
+
+class TemplateSync(models.Model):
+    """
+    Hash of the notification templates content at the last sync
+    """
+
+    UPDATE_NOTIFICATIONS = "update_notifications"
+
+    name = models.CharField(verbose_name=_("Name"), max_length=255, unique=True)
+    content_hash = models.CharField(verbose_name=_("Content Hash"), max_length=64)
+    modified = models.DateTimeField(verbose_name=_("Modified"), auto_now=True)
+
+    class Meta:
+        app_label = 'unicef_notification'
+
+    def __str__(self):
+        return self.name
+
+
+class TemplateVersion(models.Model):
+    """
+    Immutable content of an EmailTemplate, created for each distinct
+    content of the template
+    """
+
+    name = models.CharField(verbose_name=_("Name"), max_length=255)
+    language = models.CharField(verbose_name=_("Language"), max_length=12, blank=True, default="")
+    # sha256 of subject, content, html_content and references
+    content_hash = models.CharField(verbose_name=_("Content Hash"), max_length=64)
+    subject = models.TextField(verbose_name=_("Subject"), blank=True, default="")
+    content = models.TextField(verbose_name=_("Content"), blank=True, default="")
+    html_content = models.TextField(verbose_name=_("HTML Content"), blank=True, default="")
+    # name -> TemplateVersion id of the email templates extended or included,
+    # directly or not; covered by content_hash
+    references = models.JSONField(verbose_name=_("References"), blank=True, default=dict)
+    created = models.DateTimeField(verbose_name=_("Created"), auto_now_add=True)
+
+    class Meta:
+        app_label = 'unicef_notification'
+        constraints = [
+            models.UniqueConstraint(
+                fields=["name", "language", "content_hash"],
+                name="template_version_content_unique",
+            ),
+        ]
+
+    def __str__(self):
+        return "{} ({})".format(self.name, self.pk)
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError("Template versions cannot be changed")
+        super().save(*args, **kwargs)
+
+    def render(self, context):
+        """
+        Return subject, text and HTML content rendered with context, and with
+        the versions of the email templates it extends or includes
+        """
+        engine = get_references_engine(self.references) if self.references else None
+        return render_email_template(self, context, engine=engine)
+
+
+class NotificationSummaryQuerySet(models.QuerySet):
+    def between(self, start=None, end=None):
+        """Summaries of the days from start to end, inclusive"""
+        qs = self
+        if start is not None:
+            qs = qs.filter(day__gte=start)
+        if end is not None:
+            qs = qs.filter(day__lte=end)
+        return qs
+
+    def reporting(self):
+        """Read the summaries from the replica database, if configured"""
+        replica = get_replica_database()
+        return self.using(replica) if replica else self
+
+    def totals(self, *fields):
+        """Notification counts grouped by fields, e.g. totals("template_name", "status")"""
+        return self.values(*fields).annotate(count=Sum("count")).order_by(*fields)
+
+
+class NotificationSummary(models.Model):
+    """
+    Daily counts of notifications, by template, type and status, maintained
+    by the summarize_notifications command
+    """
+
+    # key of the postgres advisory lock held while summarizing
+    LOCK_KEY = zlib.crc32(b"unicef_notification.summarize_notifications")
+
+    # day the notifications were created
+    day = models.DateField(verbose_name=_("Day"))
+    template_name = models.CharField(verbose_name=_("Template Name"), max_length=255, blank=True)
+    method_type = models.CharField(verbose_name=_("Type"), max_length=255)
+    status = models.CharField(verbose_name=_("Status"), max_length=20)
+    count = models.PositiveIntegerField(verbose_name=_("Count"), default=0)
+    # start of the summarize run that counted the day
+    summarized = models.DateTimeField(verbose_name=_("Summarized"), null=True, blank=True)
+
+    objects = NotificationSummaryQuerySet.as_manager()
+
+    class Meta:
+        app_label = 'unicef_notification'
+        constraints = [
+            models.UniqueConstraint(
+                fields=["day", "template_name", "method_type", "status"],
+                name="notification_summary_unique",
+            ),
+        ]
+
+    def __str__(self):
+        return "{} {} {}: {}".format(self.day, self.template_name, self.status, self.count)
+
+    @classmethod
+    def summarize(cls, margin=300, full=False):
+        """
+        Recount the notifications of the days with notifications created or
+        changing status since the last run, less margin seconds for the
+        transactions in progress then, or all notifications if full.
+        Return the number of summaries.
+        """
+        with transaction.atomic():
+            # one summarizer at a time
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT pg_advisory_xact_lock(%s)", [cls.LOCK_KEY])
+
+            started = timezone.now()
+            notifications = Notification.objects.filter(created__isnull=False)
+            summaries = cls.objects.all()
+            watermark = None if full else summaries.aggregate(summarized=Max("summarized"))["summarized"]
+            if watermark is not None:
+                days = set(
+                    notifications.filter(
+                        status_changed__gte=watermark - datetime.timedelta(seconds=margin)
+                    )
+                    .annotate(day=TruncDate("created"))
+                    .values_list("day", flat=True)
+                    .distinct()
+                )
+                if not days:
+                    return 0
+                # ranges of created, rather than its date, to use its index
+                in_days = Q()
+                for day in days:
+                    start = timezone.make_aware(datetime.datetime.combine(day, datetime.time.min))
+                    in_days |= Q(created__gte=start, created__lt=start + datetime.timedelta(days=1))
+                notifications = notifications.filter(in_days)
+                summaries = summaries.filter(day__in=days)
+
+            rows = (
+                notifications.annotate(day=TruncDate("created"))
+                .values("day", "template_name", "method_type", "status")
+                .annotate(count=Count("id"))
+                .order_by()
+            )
+            summaries.delete()
+            return len(cls.objects.bulk_create(cls(summarized=started, **row) for row in rows))
@@ -0,0 +1,137 @@
+"""
+Notification preferences of recipients, looked up in bulk.
+
+The NotificationPreference objects of all the addresses of a set of
+notifications are fetched with a single query, and cached in each process
+for UNICEF_NOTIFICATION_PREFERENCE_CACHE_TIMEOUT seconds; the cache is
+cleared when a preference is changed in the process. Opted out addresses
+are removed from recipients and cc, before the content of the notifications
+is rendered, or, in a ``notification_batch()`` block, before the
+notifications are saved and sent.
+"""
+import functools
+import time
+from collections import namedtuple
+
+from django.conf import settings
+
+from unicef_notification.suppression import normalize_address
+
+Preference = namedtuple(
+    "Preference", ["template_name", "template_group", "method_type", "enabled", "by_address"]
+)
+
+# normalized address -> (time loaded, preferences)
+_preferences = {}
+
+
+@functools.lru_cache(maxsize=None)
+def get_template_groups():
+    """Return the group of each template, from the notification definition modules"""
+    from unicef_notification.utils import get_notification_modules
+
+    return {
+        module.name: module.group
+        for module in get_notification_modules()
+        if getattr(module, "group", "")
+    }
+
+
+def load_preferences(addresses):
+    """Return the preferences of each normalized address, querying those not cached"""
+    from django.db.models.functions import Lower
+
+    from unicef_notification.models import NotificationPreference
+
+    timeout = getattr(settings, "UNICEF_NOTIFICATION_PREFERENCE_CACHE_TIMEOUT", 300)
+    maxsize = getattr(settings, "UNICEF_NOTIFICATION_PREFERENCE_CACHE_SIZE", 100000)
+    now = time.monotonic()
+    addresses = {normalize_address(address) for address in addresses}
+    missing = [
+        address
+        for address in addresses
+        if address not in _preferences or now - _preferences[address][0] >= timeout
+    ]
+    if missing:
+        if len(_preferences) + len(missing) > maxsize:
+            _preferences.clear()
+        loaded = {address: [] for address in missing}
+        fields = ("address", "user_email", "template_name", "template_group", "method_type", "enabled")
+        qs = NotificationPreference.objects.annotate(user_email=Lower("user__email"))
+        # one query, each part using an index: of the address, and of the
+        # lowercased email of users (notification_user_email_idx)
+        rows = (
+            qs.filter(address__in=missing)
+            .values_list(*fields)
+            .union(qs.filter(user_email__in=missing).values_list(*fields), all=True)
+        )
+        for address, user_email, template_name, template_group, method_type, enabled in rows:
+            loaded[address or user_email].append(
+                Preference(template_name, template_group, method_type, enabled, bool(address))
+            )
+        for address, preferences in loaded.items():
+            _preferences[address] = (now, preferences)
+    return {address: _preferences[address][1] for address in addresses}
+
+
+def is_opted_in(preferences, template_name, method_type):
+    """
+    Whether the preferences let a notification of template_name through.
+
+    The preference of the template wins over the one of its group, which
+    wins over the one of all templates; a preference of an address wins over
+    the one of its user. Without a preference, the address is opted in.
+    """
+    group = get_template_groups().get(template_name)
+    best = None
+    for preference in preferences:
+        if preference.method_type != method_type:
+            continue
+        if preference.template_name:
+            if preference.template_name != template_name:
+                continue
+            rank = 2
+        elif preference.template_group:
+            if preference.template_group != group:
+                continue
+            rank = 1
+        else:
+            rank = 0
+        rank = (rank, preference.by_address)
+        if best is None or rank > best[0]:
+            best = (rank, preference.enabled)
+    return best is None or best[1]
+
+
+def apply_preferences(notifications):
+    """
+    Remove the opted out addresses from the recipients and cc of the
+    unsaved notifications, and add them to their suppressed_recipients.
+    """
+    preferences = load_preferences(
+        address
+        for notification in notifications
+        for address in notification.recipients + notification.cc
+    )
+    for notification in notifications:
+        removed = []
+        for field in ("recipients", "cc"):
+            allowed = []
+            for address in getattr(notification, field):
+                if is_opted_in(
+                    preferences[normalize_address(address)],
+                    notification.template_name,
+                    notification.method_type,
+                ):
+                    allowed.append(address)
+                else:
+                    removed.append(address)
+            setattr(notification, field, allowed)
+        if removed:
+            notification.suppressed_recipients = notification.suppressed_recipients + removed
+
+
+def clear():
+    """Force the preferences to be reloaded on next use"""
+    _preferences.clear()
+    get_template_groups.cache_clear()
@@ -0,0 +1,208 @@
+"""
+Opt-in profiling of notification sends.
+
+Enabled for all sends by UNICEF_NOTIFICATION_PROFILE, or for the sends of a
+block by the ``profiling()`` context manager. A sample of the calls to
+``send_notification``, ``send_notification_with_template`` and
+``Notification.send_mail`` are run under cProfile, and their stats dumped
+as ``.prof`` files (readable by pstats, snakeviz or flameprof). Sends slower
+than a threshold get a ``.json`` report of their duration and SQL queries;
+only the count and duration of each SQL statement are recorded, not the
+parameters of the queries, which can hold personal data.
+Reports are written to a directory, keeping only the most recent ones.
+"""
+import cProfile
+import functools
+import json
+import logging
+import os
+import random
+import re
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# distinct SQL statements kept in a slow send report
+MAX_QUERIES = 1000
+
+# names of the reports, "<timestamp>-<pid>-<name>.prof|.json"
+REPORT_NAME_RE = re.compile(r"^\d{8}T\d{12}-\d+-[\w.]+\.(prof|json)$")
+
+_local = threading.local()
+
+
+class ProfileOptions:
+    def __init__(self, sample_rate=None, threshold=None, directory=None, max_reports=None):
+        self.sample_rate = (
+            sample_rate
+            if sample_rate is not None
+            else getattr(settings, "UNICEF_NOTIFICATION_PROFILE_SAMPLE_RATE", 0.01)
+        )
+        # seconds
+        self.threshold = (
+            threshold
+            if threshold is not None
+            else getattr(settings, "UNICEF_NOTIFICATION_PROFILE_THRESHOLD", 1.0)
+        )
+        self.directory = directory or getattr(
+            settings,
+            "UNICEF_NOTIFICATION_PROFILE_DIR",
+            os.path.join(tempfile.gettempdir(), "unicef_notification_profiles"),
+        )
+        self.max_reports = max_reports or getattr(
+            settings, "UNICEF_NOTIFICATION_PROFILE_MAX_REPORTS", 100
+        )
+
+
+def get_options():
+    """Return the profiling options of this thread, or None if it is disabled"""
+    options = getattr(_local, "options", None)
+    if options is None and getattr(settings, "UNICEF_NOTIFICATION_PROFILE", False):
+        options = ProfileOptions()
+    return options
+
+
+@contextmanager
+def profiling(sample_rate=1.0, threshold=None, directory=None, max_reports=None):
+    """Profile the sends of the block, with options defaulting to the settings"""
+    previous = getattr(_local, "options", None)
+    _local.options = ProfileOptions(sample_rate, threshold, directory, max_reports)
+    try:
+        yield _local.options
+    finally:
+        _local.options = previous
+
+
+class QueryLog:
+    """
+    execute_wrapper counting the queries of the connection, and their
+    duration, by SQL statement
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        # SQL statement -> [count, duration]
+        self.statements = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            self.count += 1
+            self.duration += duration
+            statement = self.statements.get(sql)
+            if statement is not None:
+                statement[0] += 1
+                statement[1] += duration
+            elif len(self.statements) < MAX_QUERIES:
+                self.statements[sql] = [1, duration]
+
+    @property
+    def queries(self):
+        """The statements, slowest first"""
+        return sorted(
+            (
+                {"sql": sql, "count": count, "duration": duration}
+                for sql, (count, duration) in self.statements.items()
+            ),
+            key=lambda query: query["duration"],
+            reverse=True,
+        )
+
+
+def write_report(options, name, suffix, write):
+    """
+    Write a report with write(path), then delete the oldest reports; other
+    files of the directory are left alone
+    """
+    try:
+        os.makedirs(options.directory, exist_ok=True)
+        path = os.path.join(
+            options.directory,
+            "{}-{}-{}{}".format(
+                timezone.now().strftime("%Y%m%dT%H%M%S%f"), os.getpid(), name, suffix
+            ),
+        )
+        write(path)
+        # names start with the time of the report
+        reports = sorted(
+            (
+                entry
+                for entry in os.scandir(options.directory)
+                if entry.is_file() and REPORT_NAME_RE.match(entry.name)
+            ),
+            key=lambda entry: entry.name,
+        )
+        for entry in reports[: max(len(reports) - options.max_reports, 0)]:
+            os.remove(entry.path)
+    except OSError:
+        logger.exception("Failed to write profiling report.")
+        return None
+    return path
+
+
+def _write_json(data):
+    def write(path):
+        with open(path, "w") as f:
+            json.dump(data, f, indent=2)
+
+    return write
+
+
+def profiled(name):
+    """Decorate a send function, to profile its calls when profiling is enabled"""
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            # profile the outermost send only, e.g. send_notification
+            # rather than the send_mail it calls
+            if getattr(_local, "active", False):
+                return func(*args, **kwargs)
+            options = get_options()
+            if options is None:
+                return func(*args, **kwargs)
+
+            profile = cProfile.Profile() if random.random() < options.sample_rate else None
+            query_log = QueryLog()
+            _local.active = True
+            start = time.perf_counter()
+            try:
+                with connection.execute_wrapper(query_log):
+                    if profile is not None:
+                        return profile.runcall(func, *args, **kwargs)
+                    return func(*args, **kwargs)
+            finally:
+                duration = time.perf_counter() - start
+                _local.active = False
+                if profile is not None:
+                    write_report(options, name, ".prof", profile.dump_stats)
+                if duration > options.threshold:
+                    write_report(
+                        options,
+                        name,
+                        ".json",
+                        _write_json(
+                            {
+                                "name": name,
+                                "duration": duration,
+                                "query_count": query_log.count,
+                                "query_duration": query_log.duration,
+                                "queries": query_log.queries,
+                            }
+                        ),
+                    )
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,109 @@
+"""
+Memoization of rendered EmailTemplate objects.
+
+Notifications rendering the same template with the same context share one
+rendering, kept in a per-process LRU cache of
+UNICEF_NOTIFICATION_RENDER_CACHE_SIZE entries (disabled when 0, the default).
+Renderings are keyed on the TemplateVersion of the template, so they never
+go stale.
+"""
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.template import Context, Template
+
+
+def render_email_template(template, context, engine=None):
+    """
+    Render subject, text and HTML content of template, as post_office does,
+    with engine or the default template engine
+    """
+    from_string = engine.from_string if engine is not None else Template
+    _context = Context(context or {})
+    return (
+        from_string(template.subject).render(_context),
+        from_string(template.content).render(_context),
+        from_string(template.html_content).render(_context),
+    )
+
+
+def context_hash(context):
+    serialized = json.dumps(context or {}, sort_keys=True, cls=DjangoJSONEncoder)
+    return hashlib.sha1(serialized.encode("utf-8")).hexdigest()
+
+
+class RenderCache:
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._renders = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def get_key(template, context):
+        from unicef_notification.versions import get_template_version_id
+
+        return (get_template_version_id(template), context_hash(context))
+
+    def render(self, template, context):
+        key = self.get_key(template, context)
+        with self._lock:
+            rendered = self._renders.get(key)
+            if rendered is not None:
+                self._renders.move_to_end(key)
+                self.hits += 1
+                return rendered
+            self.misses += 1
+
+        rendered = render_email_template(template, context)
+        with self._lock:
+            self._renders[key] = rendered
+            while len(self._renders) > self.maxsize:
+                self._renders.popitem(last=False)
+        return rendered
+
+    def info(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self._renders),
+            "maxsize": self.maxsize,
+        }
+
+    def clear(self):
+        with self._lock:
+            self._renders.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+_render_cache = None
+
+
+def get_render_cache():
+    """Return the render cache, or None if it is disabled"""
+    global _render_cache
+    maxsize = getattr(settings, "UNICEF_NOTIFICATION_RENDER_CACHE_SIZE", 0)
+    if not maxsize:
+        return None
+    if _render_cache is None or _render_cache.maxsize != maxsize:
+        _render_cache = RenderCache(maxsize)
+    return _render_cache
+
+
+def get_render_cache_info():
+    """Return hits, misses and size of the render cache, for tuning its size"""
+    render_cache = get_render_cache()
+    if render_cache is None:
+        return None
+    return render_cache.info()
+
+
+def clear():
+    if _render_cache is not None:
+        _render_cache.clear()
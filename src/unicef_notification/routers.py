@@ -0,0 +1,68 @@
+"""
+Routing of notification history and reporting reads to a read replica.
+
+Set the alias of the replica database, and add the router::
+
+    UNICEF_NOTIFICATION_REPLICA_DATABASE = "replica"
+    DATABASE_ROUTERS = ["unicef_notification.routers.ReplicaRouter"]
+
+Reads of the models of this app inside a ``replica_reads()`` block, such as
+the notification admin changelist, then go to the replica, unless they happen
+in a transaction of the primary (e.g. claiming queued notifications). Writes,
+reads of the models of other apps (users, sessions, post_office emails, ...),
+and all reads outside such blocks, stay on the primary. Querysets can also be sent to the
+replica explicitly with ``reporting()``, e.g. for exports and statistics.
+"""
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connections, DEFAULT_DB_ALIAS
+
+# apps whose reads are routed to the replica
+APP_LABELS = {"unicef_notification"}
+
+_local = threading.local()
+
+
+def get_replica_database():
+    """Return the alias of the replica database, or None if not configured"""
+    return getattr(settings, "UNICEF_NOTIFICATION_REPLICA_DATABASE", None)
+
+
+@contextmanager
+def replica_reads():
+    """Route the reads of the block to the replica, through ReplicaRouter"""
+    _local.depth = getattr(_local, "depth", 0) + 1
+    try:
+        yield
+    finally:
+        _local.depth -= 1
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        replica = get_replica_database()
+        if not replica or not getattr(_local, "depth", 0):
+            return None
+        if model._meta.app_label not in APP_LABELS:
+            return None
+        # keep the reads of a primary transaction consistent with its writes
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+        return replica
+
+    def db_for_write(self, model, **hints):
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # the replica holds the same data as the primary
+        databases = {DEFAULT_DB_ALIAS, get_replica_database()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == get_replica_database():
+            return False
+        return None
@@ -0,0 +1,56 @@
+"""
+In-process set of suppressed email addresses, refreshed from the
+SuppressedAddress table every UNICEF_NOTIFICATION_SUPPRESSION_REFRESH_INTERVAL
+seconds, so that filtering recipients does not query the database per address.
+"""
+import time
+from email.utils import parseaddr
+
+from django.conf import settings
+
+_suppressed = frozenset()
+_loaded_at = None
+
+
+def normalize_address(address):
+    return parseaddr(address)[1].lower()
+
+
+def get_suppressed_addresses():
+    global _suppressed, _loaded_at
+    from unicef_notification.models import SuppressedAddress
+
+    interval = getattr(settings, "UNICEF_NOTIFICATION_SUPPRESSION_REFRESH_INTERVAL", 300)
+    now = time.monotonic()
+    if _loaded_at is None or now - _loaded_at >= interval:
+        _suppressed = frozenset(
+            SuppressedAddress.objects.active().values_list("address", flat=True)
+        )
+        _loaded_at = now
+    return _suppressed
+
+
+def clear():
+    """Force the suppressed addresses to be reloaded on next use"""
+    global _loaded_at
+    _loaded_at = None
+
+
+def filter_suppressed(*address_lists):
+    """
+    Remove suppressed addresses from each of the given lists of addresses.
+
+    Return the filtered lists, followed by the list of removed addresses.
+    """
+    suppressed = get_suppressed_addresses()
+    removed = []
+    filtered = []
+    for addresses in address_lists:
+        allowed = []
+        for address in addresses:
+            if normalize_address(address) in suppressed:
+                removed.append(address)
+            else:
+                allowed.append(address)
+        filtered.append(allowed)
+    return (*filtered, removed)
@@ -1,10 +1,21 @@
 import json
+import os
+from functools import partial
+from importlib import import_module
 
+from django.apps import apps
 from django.conf import settings
-from django.core import serializers
-from django.db import models
+from django.core.exceptions import ValidationError
+from django.db import transaction
 from django.template import Context
 from django.template.loader import get_template
+from django.utils import timezone
+
+from unicef_notification.batch import get_current_batch, notification_batch
+from unicef_notification.context import ContextMemo, provide_context
+from unicef_notification.preferences import apply_preferences
+from unicef_notification.profiling import profiled
+from unicef_notification.suppression import filter_suppressed
 
 
 def model_to_dictionary(obj):
@@ -28,6 +39,8 @@ def model_to_dictionary(obj):
 
     # Note that Django's serializers only work on iterables of model instances
 
+    from django.core import serializers
+
     json_string = serializers.serialize("json", [obj])
     # The string will deserialize to a list with one simple dictionary, like
     # {
@@ -52,12 +65,21 @@ def serialize_dict(data):
     the model instances are replaced with dictionaries so that
     the whole thing should be serializable.
     """
+    from django.db import models
+
     return {
         k: model_to_dictionary(v) if isinstance(v, models.Model) else v
         for k, v in data.items()
     }
 
 
+def parse_priority(priority):
+    """post_office's parse_priority, post_office being imported on first use"""
+    from post_office import utils
+
+    return utils.parse_priority(priority)
+
+
 def strip_text(text):
     return "\r\n".join([line.lstrip() for line in text.splitlines()])
 
@@ -74,6 +96,67 @@ def get_template_content(content, filename, context={}):
     return ""
 
 
+def get_notification_modules():
+    """
+    Import and return the notification definition modules, found in the
+    UNICEF_NOTIFICATION_TEMPLATE_DIR package of each installed app
+    """
+    template_dir = getattr(settings, "UNICEF_NOTIFICATION_TEMPLATE_DIR", "notifications")
+    modules = []
+    # loop through apps
+    for app in apps.get_app_configs():
+        # check if notification template dir exists
+        notification_dir = "{}/{}".format(app.path, template_dir)
+        if os.path.isdir(notification_dir):
+            # walk through notification templates
+            filenames = [
+                f
+                for f in os.listdir(notification_dir)
+                if os.path.isfile(os.path.join(notification_dir, f))
+            ]
+            for filename in filenames:
+                if filename.startswith("__"):
+                    continue
+                modules.append(
+                    import_module(
+                        "{}.{}.{}".format(app.name, template_dir, filename.rsplit(".")[0])
+                    )
+                )
+    return modules
+
+
+def _apply_preferences(notification):
+    """
+    Remove the opted out addresses of the notification, before its content is
+    rendered; a batch applies the preferences of all its notifications on flush
+    """
+    if get_current_batch() is None:
+        apply_preferences([notification])
+
+
+def _save_notification(notification, send_disabled=False, queued=False):
+    send = False
+    if not send_disabled:
+        if notification.send_at is not None:
+            notification.status = notification.STATUS.scheduled
+        elif queued:
+            notification.status = notification.STATUS.pending
+        else:
+            send = True
+    batch = get_current_batch()
+    if batch is not None:
+        batch.add(notification, send=send)
+        return
+    if notification.is_suppressed:
+        notification.status = notification.STATUS.suppressed
+        send = False
+    notification.full_clean()
+    notification.save()
+    if send:
+        notification.send_notification()
+
+
+@profiled("send_notification")
 def send_notification(
     recipients,
     sender=None,
@@ -86,6 +169,9 @@ def send_notification(
     content_filename=None,
     html_content=None,
     html_content_filename=None,
+    priority=None,
+    queued=False,
+    send_at=None,
 ):
     """
     Send a notification, building the content from templates and
@@ -108,6 +194,24 @@ def send_notification(
 
     * context: dictionary used to render the templates, or None.
 
+    * priority: post_office priority of the email, by name ('low', 'medium',
+      'high', 'now') or value. Defaults to post_office's DEFAULT_PRIORITY.
+
+    * queued: if True, the notification is saved as pending and sent by the
+      ``send_notifications`` command, highest priority first.
+
+    * send_at: datetime to send the notification at. The notification is
+      saved as scheduled, and queued by the ``schedule_notifications``
+      command once due.
+
+    Suppressed addresses (see ``SuppressedAddress``), and addresses opted
+    out of the notification (see ``NotificationPreference``), are removed
+    from recipients and cc, and recorded in ``suppressed_recipients``. If
+    none are left, the notification is saved as suppressed, and not sent.
+
+    Inside a ``notification_batch()`` block, the notification is only saved
+    and sent when the transaction commits.
+
     Then, for each of subject, plain text message content, and html text message
     content, you can provide either the raw content, or the name of a template file.
     (If you provide both, the content will be used, not the template file).
@@ -117,31 +221,35 @@ def send_notification(
     if not (sender or from_address):
         from_address = settings.DEFAULT_FROM_EMAIL
 
-    # Let the model handle parameter validation by creating the instance
-    # and 'cleaning' it before saving.
-    subject = get_template_content(subject, subject_filename, context)
-    text_message = get_template_content(content, content_filename, context)
-    html_message = get_template_content(html_content, html_content_filename, context)
-
     if isinstance(recipients, str):
         recipients = [recipients]
+    recipients, cc, suppressed = filter_suppressed(recipients, cc or [])
 
+    # Let the model handle parameter validation by creating the instance
+    # and 'cleaning' it before saving.
     notification = Notification(
         method_type=Notification.TYPE_EMAIL,
         sender=sender,
         from_address=from_address,
         recipients=recipients,
-        cc=cc or [],
+        cc=cc,
+        suppressed_recipients=suppressed,
         template_data=context,
-        subject=subject,
-        text_message=text_message,
-        html_message=html_message,
+        priority=parse_priority(priority),
+        send_at=send_at,
     )
-    notification.full_clean()
-    notification.save()
-    notification.send_notification()
-
-
+    _apply_preferences(notification)
+    # nothing is rendered for a notification that is not sent
+    if not notification.is_suppressed:
+        notification.subject = get_template_content(subject, subject_filename, context)
+        notification.text_message = get_template_content(content, content_filename, context)
+        notification.html_message = get_template_content(
+            html_content, html_content_filename, context
+        )
+    _save_notification(notification, queued=queued)
+
+
+@profiled("send_notification_with_template")
 def send_notification_with_template(
     recipients,
     template_name,
@@ -150,6 +258,10 @@ def send_notification_with_template(
     from_address="",
     cc=None,
     send_disabled=False,
+    priority=None,
+    queued=False,
+    send_at=None,
+    language="",
 ):
     """
     Send an email notification using an EmailTemplate object as the source of
@@ -172,8 +284,33 @@ def send_notification_with_template(
 
     * context: dictionary used to render the templates, or None.
 
+    * priority: post_office priority of the email, by name ('low', 'medium',
+      'high', 'now') or value. Defaults to post_office's DEFAULT_PRIORITY.
+
+    * queued: if True, the notification is saved as pending and sent by the
+      ``send_notifications`` command, highest priority first.
+
+    * send_at: datetime to send the notification at. The notification is
+      saved as scheduled, and queued by the ``schedule_notifications``
+      command once due.
+
     * template_name: name of email template to use (there must be a EmailTemplate
       record with that name)
+
+    * language: language of the EmailTemplate variant to use; there must be
+      a variant of the template in that language, or a ValidationError is
+      raised.
+
+    The context provider of the template, if any, adds its items to the
+    context; see ``unicef_notification.context``.
+
+    Suppressed addresses (see ``SuppressedAddress``), and addresses opted
+    out of the notification (see ``NotificationPreference``), are removed
+    from recipients and cc, and recorded in ``suppressed_recipients``. If
+    none are left, the notification is saved as suppressed, and not sent.
+
+    Inside a ``notification_batch()`` block, the notification is only saved
+    and sent when the transaction commits.
     """
     from unicef_notification.models import Notification
 
@@ -182,6 +319,7 @@ def send_notification_with_template(
 
     if isinstance(recipients, str):
         recipients = [recipients]
+    recipients, cc, suppressed = filter_suppressed(recipients, cc or [])
 
     assert template_name
 
@@ -192,11 +330,210 @@ def send_notification_with_template(
         sender=sender,
         from_address=from_address,
         recipients=recipients,
-        cc=cc or [],
+        cc=cc,
+        suppressed_recipients=suppressed,
         template_name=template_name,
-        template_data=context,
+        priority=parse_priority(priority),
+        send_at=send_at,
+        language=language,
     )
-    notification.full_clean()
-    notification.save()
-    if not send_disabled:
-        notification.send_notification()
+    _apply_preferences(notification)
+    # the context provider is not called for a notification that is not sent
+    if not notification.is_suppressed:
+        batch = get_current_batch()
+        memo = batch.memo if batch is not None else ContextMemo()
+        context = provide_context(template_name, context, memo)
+    notification.template_data = Notification.serializable(context)
+    _save_notification(notification, send_disabled=send_disabled, queued=queued)
+
+
+def send_localized_notification_with_template(
+    recipients,
+    template_name,
+    context,
+    languages,
+    **kwargs,
+):
+    """
+    Send an email notification using the EmailTemplate variant in each
+    recipient's language.
+
+    * languages: dictionary of recipient email to language, or a callable
+      returning the language of a recipient email. Recipients without a
+      language, or whose language has no variant of the template, get the
+      default one.
+
+    Recipients are grouped by language, and one notification is sent per
+    language; the variants are fetched with a single query. Other arguments
+    are as for ``send_notification_with_template``; cc is copied on the
+    notification of every language.
+
+    Return the languages the notifications were sent in.
+    """
+    from unicef_notification.cache import cache_email_templates
+    from unicef_notification.models import EmailTemplate
+
+    if isinstance(recipients, str):
+        recipients = [recipients]
+    get_language = languages.get if isinstance(languages, dict) else languages
+
+    groups = {}
+    for recipient in recipients:
+        groups.setdefault(get_language(recipient) or "", []).append(recipient)
+
+    templates = list(
+        EmailTemplate.objects.filter(name=template_name, language__in=set(groups) | {""})
+    )
+    variants = {template.language for template in templates}
+    if "" not in variants:
+        raise ValidationError("No such EmailTemplate: %s" % template_name)
+    # later lookups of the variants hit the cache, and skip validation
+    cache_email_templates(templates)
+
+    by_language = {}
+    for language, group in groups.items():
+        if language not in variants:
+            language = ""
+        by_language.setdefault(language, []).extend(group)
+
+    with notification_batch():
+        for language, group in by_language.items():
+            send_notification_with_template(
+                group, template_name, context, language=language, **kwargs
+            )
+    return list(by_language)
+
+
+def send_notification_to_queryset(
+    queryset,
+    template_name,
+    address="email",
+    context=None,
+    get_context=None,
+    sender=None,
+    from_address="",
+    priority=None,
+    queued=False,
+    chunk_size=1000,
+    checkpoint=None,
+):
+    """
+    Send an email notification, using an EmailTemplate object as the source
+    of the templates, to every object of a queryset.
+
+    The queryset is read in chunks of ``chunk_size`` objects, in primary key
+    order; each chunk is saved, then sent once committed, before the next one
+    is fetched, so memory use does not depend on the size of the queryset.
+    In a transaction, the chunks are sent when it commits.
+
+    * address: name of the field holding the email address of an object, or
+      a callable returning the email address (or list of addresses) of an
+      object. Objects without an address are skipped.
+
+    * context: dictionary used to render the templates, shared by all objects.
+
+    * get_context: callable returning the context of an object, added to
+      ``context``. The context provider of the template, if any, is then
+      called with a memo shared by the chunk.
+
+    * checkpoint: name under which the progress is saved. Running again with
+      the same checkpoint resumes after the last object that was sent to.
+
+    * sender, from_address, priority, queued: as for
+      ``send_notification_with_template``.
+
+    Return the number of notifications created.
+    """
+    from django.db.models import F
+
+    from unicef_notification.models import Notification, SendCheckpoint
+    from unicef_notification.validations import validate_template_name
+
+    if not (sender or from_address):
+        from_address = settings.DEFAULT_FROM_EMAIL
+
+    assert template_name
+    validate_template_name(template_name)
+    priority = parse_priority(priority)
+
+    if not callable(address):
+        address_field = address
+
+        def address(obj):
+            return getattr(obj, address_field)
+
+    last_pk = None
+    if checkpoint:
+        progress, __ = SendCheckpoint.objects.get_or_create(name=checkpoint)
+        if progress.last_pk:
+            last_pk = queryset.model._meta.pk.to_python(progress.last_pk)
+
+    total = 0
+    queryset = queryset.order_by("pk")
+    while True:
+        chunk_qs = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+        chunk = list(chunk_qs[:chunk_size])
+        if not chunk:
+            break
+        last_pk = chunk[-1].pk
+
+        objects = []
+        notifications = []
+        for obj in chunk:
+            recipients = address(obj)
+            if not recipients:
+                continue
+            if isinstance(recipients, str):
+                recipients = [recipients]
+            recipients, suppressed = filter_suppressed(recipients)
+            objects.append(obj)
+            notifications.append(
+                Notification(
+                    method_type=Notification.TYPE_EMAIL,
+                    sender=sender,
+                    from_address=from_address,
+                    recipients=recipients,
+                    suppressed_recipients=suppressed,
+                    template_name=template_name,
+                    priority=priority,
+                    status=Notification.STATUS.pending if queued else Notification.STATUS.draft,
+                )
+            )
+
+        # the preferences of the chunk, before building any context
+        apply_preferences(notifications)
+        memo = ContextMemo()
+        for obj, notification in zip(objects, notifications):
+            template_data = dict(context or {})
+            if notification.is_suppressed:
+                notification.status = Notification.STATUS.suppressed
+            else:
+                if get_context is not None:
+                    template_data.update(get_context(obj))
+                template_data = provide_context(template_name, template_data, memo)
+            notification.template_data = Notification.serializable(template_data)
+            # the template name was validated once, above
+            notification.full_clean(exclude=["template_name"])
+            notification.sender_email = notification.get_sender_email()
+
+        # save the chunk along with the progress, so an interrupted run
+        # resumes with the first chunk that was not committed; it is sent
+        # once committed, so no email goes out for a chunk rolled back
+        with transaction.atomic():
+            Notification.objects.bulk_create(notifications)
+            if checkpoint:
+                SendCheckpoint.objects.filter(name=checkpoint).update(
+                    last_pk=str(last_pk),
+                    count=F("count") + len(notifications),
+                    modified=timezone.now(),
+                )
+            if not queued:
+                transaction.on_commit(
+                    partial(
+                        Notification.send_bulk,
+                        [n for n in notifications if n.status != Notification.STATUS.suppressed],
+                    )
+                )
+        total += len(notifications)
+
+    return total
@@ -2,11 +2,18 @@ from django.core.exceptions import ValidationError
 
 from post_office.models import EmailTemplate
 
+from unicef_notification.cache import is_known_template_name
 
-def validate_template_name(template_name):
-    try:
-        EmailTemplate.objects.get(name=template_name)
-    except EmailTemplate.DoesNotExist:
+
+def validate_template_name(template_name, language=""):
+    """Check that the EmailTemplate variant of template_name in language exists"""
+    if is_known_template_name(template_name, language):
+        return
+    if not EmailTemplate.objects.filter(name=template_name, language=language).exists():
+        if language:
+            raise ValidationError(
+                "No such EmailTemplate: %s (language %s)" % (template_name, language)
+            )
         raise ValidationError("No such EmailTemplate: %s" % template_name)
 
 
@@ -0,0 +1,190 @@
+"""
+Immutable versions of EmailTemplate objects.
+
+A TemplateVersion is created for each distinct content of a template, when
+the templates are synced and when a notification is sent with it. The
+versions of the email templates it extends or includes are part of its
+content, so a template gets a new version when one of them changes, and
+a version is rendered again with the versions of the templates it
+references. Versions never change, so their ids are cached in each
+process without invalidation, once committed; until then, in the
+transaction that created them.
+"""
+import hashlib
+import json
+import re
+import threading
+
+from django.db import transaction
+from django.template import Engine
+
+from unicef_notification.loaders import get_email_template_prefix
+
+# {% extends %} and {% include %} tags of a constant template name
+TEMPLATE_REFERENCE_RE = re.compile(r"""{%\s*(?:extends|include)\s+(["'])(.+?)\1""")
+
+# (name, language, last_updated) of EmailTemplate objects -> hash of their
+# content, and names of the email templates they reference
+_contents = {}
+
+# (name, language, content hash) -> TemplateVersion id
+_version_ids = {}
+
+# (name, language, content hash) -> (TemplateVersion id, on_commit callback)
+# of the versions created in the current transaction of the thread
+_local = threading.local()
+
+
+def template_content_hash(template):
+    serialized = json.dumps([template.subject, template.content, template.html_content])
+    return hashlib.sha256(serialized.encode("utf-8")).hexdigest()
+
+
+def get_referenced_names(template):
+    """
+    Names of the email templates that template extends or includes through
+    the EmailTemplateLoader
+    """
+    prefix = get_email_template_prefix()
+    names = set()
+    for source in (template.subject, template.content, template.html_content):
+        for __, name in TEMPLATE_REFERENCE_RE.findall(source or ""):
+            if name.startswith(prefix):
+                names.add(name[len(prefix):])
+    return sorted(names)
+
+
+def get_content(template):
+    """
+    Return the content hash of template and the names of the email templates
+    it references, computed once per saved content of the template
+    """
+    key = (template.name, template.language, template.last_updated)
+    content = _contents.get(key)
+    if content is None:
+        content = (template_content_hash(template), get_referenced_names(template))
+        if template.last_updated is not None:
+            _contents[key] = content
+    return content
+
+
+def get_references(template, seen=()):
+    """
+    Return the TemplateVersion ids of the email templates that template
+    extends or includes, directly or not, by name
+    """
+    from post_office.models import EmailTemplate
+    from post_office.utils import get_email_template
+
+    seen = seen + (template.name,)
+    references = {}
+    __, names = get_content(template)
+    for name in names:
+        if name in seen or name in references:
+            continue
+        try:
+            # loaded as the EmailTemplateLoader does, in the default language
+            referenced = get_email_template(name)
+        except EmailTemplate.DoesNotExist:
+            # rendering fails anyway
+            continue
+        referenced_references = get_references(referenced, seen)
+        references[name] = _get_version_id(referenced, referenced_references)
+        references.update(referenced_references)
+    return references
+
+
+def get_template_version_id(template):
+    """
+    Return the id of the TemplateVersion of the current content of template,
+    and of the email templates it extends or includes
+    """
+    return _get_version_id(template, get_references(template))
+
+
+def _get_version_id(template, references):
+    from unicef_notification.models import TemplateVersion
+
+    content_hash, __ = get_content(template)
+    if references:
+        serialized = json.dumps([content_hash, sorted(references.items())])
+        content_hash = hashlib.sha256(serialized.encode("utf-8")).hexdigest()
+    key = (template.name, template.language, content_hash)
+    version_id = _version_ids.get(key) or _get_pending_version_id(key)
+    if version_id is None:
+        version, __ = TemplateVersion.objects.get_or_create(
+            name=template.name,
+            language=template.language,
+            content_hash=content_hash,
+            defaults={
+                "subject": template.subject,
+                "content": template.content,
+                "html_content": template.html_content,
+                "references": references,
+            },
+        )
+        version_id = version.pk
+        _add_pending_version_id(key, version_id)
+    return version_id
+
+
+def _get_pending_version_id(key):
+    """
+    Return the id of the version of key created in the current transaction,
+    unless the transaction or savepoint it was created in was rolled back,
+    discarding the on_commit callback that caches it
+    """
+    pending = getattr(_local, "pending", {})
+    if key not in pending:
+        return None
+    version_id, callback = pending[key]
+    if not any(entry[1] is callback for entry in transaction.get_connection().run_on_commit):
+        del pending[key]
+        return None
+    return version_id
+
+
+def _add_pending_version_id(key, version_id):
+    # the version may be rolled back along with the current transaction, so
+    # it is only cached for the process once committed
+    def callback():
+        _version_ids.setdefault(key, version_id)
+        getattr(_local, "pending", {}).pop(key, None)
+
+    if transaction.get_connection().in_atomic_block:
+        _local.__dict__.setdefault("pending", {})[key] = (version_id, callback)
+    transaction.on_commit(callback)
+
+
+def get_references_engine(references):
+    """
+    Return a copy of the default template engine that loads the email
+    templates of references from their TemplateVersion, rather than from
+    their current EmailTemplate
+    """
+    from unicef_notification.models import TemplateVersion
+
+    prefix = get_email_template_prefix()
+    versions = TemplateVersion.objects.in_bulk(references.values())
+    templates = {
+        "{}{}".format(prefix, name): versions[pk].html_content
+        for name, pk in references.items()
+        if pk in versions
+    }
+    default = Engine.get_default()
+    return Engine(
+        dirs=default.dirs,
+        loaders=[("django.template.loaders.locmem.Loader", templates)] + list(default.loaders),
+        debug=default.debug,
+        string_if_invalid=default.string_if_invalid,
+        file_charset=default.file_charset,
+        libraries=default.libraries,
+        builtins=default.builtins[len(Engine.default_builtins):],
+        autoescape=default.autoescape,
+    )
+
+
+def clear():
+    _contents.clear()
+    _version_ids.clear()
+    getattr(_local, "pending", {}).clear()
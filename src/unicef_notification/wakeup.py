@@ -0,0 +1,39 @@
+"""
+Wake-up of send_notifications workers through postgres LISTEN/NOTIFY.
+
+A trigger (see migration 0009) notifies CHANNEL whenever a notification
+becomes pending, so idle workers can block on the channel instead of polling.
+"""
+import select
+
+from django.db import connection as default_connection
+
+CHANNEL = "unicef_notification_pending"
+
+
+def listen(connection=default_connection):
+    """Subscribe the database connection to CHANNEL; it is safe to repeat"""
+    with connection.cursor() as cursor:
+        cursor.execute("LISTEN {}".format(CHANNEL))
+
+
+def wait(timeout, connection=default_connection):
+    """
+    Block until a notification is received on CHANNEL, or timeout seconds
+    have passed. Return True if woken up by a notification.
+    """
+    listen(connection)
+    pg_connection = connection.connection
+    if hasattr(pg_connection, "poll"):
+        # psycopg2
+        if not pg_connection.notifies:
+            if select.select([pg_connection], [], [], timeout) == ([], [], []):
+                return False
+            pg_connection.poll()
+        received = bool(pg_connection.notifies)
+        del pg_connection.notifies[:]
+        return received
+    # psycopg 3
+    for notify in pg_connection.notifies(timeout=timeout, stop_after=1):
+        return True
+    return False
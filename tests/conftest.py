@@ -4,6 +4,23 @@ from django.contrib.auth.models import Permission
 import pytest
 
 from tests import factories
+from unicef_notification import cache, context, preferences, rendering, suppression, versions
+
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    yield
+    cache.clear()
+    context.clear()
+    rendering.clear()
+    versions.clear()
+
+
+@pytest.fixture(autouse=True)
+def clear_suppressed_addresses():
+    yield
+    suppression.clear()
+    preferences.clear()
 
 
 @pytest.fixture()
@@ -5,3 +5,5 @@ defaults = {
     "content": "Author: {{author}}",
     "html_content": "<em>Author</em>: {{author}}",
 }
+context_provider = "demo.sample.providers.author_context"
+group = "authors"
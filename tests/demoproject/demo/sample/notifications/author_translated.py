@@ -0,0 +1,15 @@
+name = "author-translated"
+defaults = {
+    "description": "Sample email about Author, with translations",
+    "subject": "New Author",
+    "content": "Author: {{author}}",
+    "html_content": "<em>Author</em>: {{author}}",
+}
+translations = {
+    "fr": {
+        "description": "Sample email about Author, in French",
+        "subject": "Nouvel auteur",
+        "content": "Auteur: {{author}}",
+        "html_content": "<em>Auteur</em>: {{author}}",
+    },
+}
@@ -0,0 +1,12 @@
+from demo.sample.models import Author
+
+
+def author_context(context, memo):
+    author_id = context.get("author_id")
+    if author_id is None:
+        return {}
+    return {
+        "author": memo.get(
+            ("author", author_id), lambda: Author.objects.get(pk=author_id).name
+        ),
+    }
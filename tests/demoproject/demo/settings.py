@@ -86,7 +86,15 @@ DATABASES = {
         "HOST": "127.0.0.1",
         "NAME": "unicef_notification",
         "USER": "postgres",
-    }
+    },
+    # same database, to test routing to a read replica
+    "replica": {
+        "ENGINE": "django.db.backends.postgresql",
+        "HOST": "127.0.0.1",
+        "NAME": "unicef_notification",
+        "USER": "postgres",
+        "TEST": {"MIRROR": "default"},
+    },
 }
 
 
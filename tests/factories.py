@@ -63,3 +63,17 @@ class EmailTemplateFactory(factory.django.DjangoModelFactory):
 
     class Meta:
         model = models.EmailTemplate
+
+
+class SuppressedAddressFactory(factory.django.DjangoModelFactory):
+    address = factory.Faker("email")
+
+    class Meta:
+        model = models.SuppressedAddress
+
+
+class NotificationPreferenceFactory(factory.django.DjangoModelFactory):
+    address = factory.Faker("email")
+
+    class Meta:
+        model = models.NotificationPreference
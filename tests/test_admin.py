@@ -0,0 +1,108 @@
+from django.contrib.admin.views.main import ChangeList, PAGE_VAR
+from django.contrib.messages.storage.fallback import FallbackStorage
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+
+import pytest
+from unittest.mock import patch
+
+from tests.factories import NotificationFactory
+from unicef_notification.admin import EstimatedCountPaginator, NotificationAdmin
+from unicef_notification.models import Notification
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def notification_admin(admin_site):
+    return NotificationAdmin(Notification, admin_site)
+
+
+@pytest.fixture
+def admin_request(superuser):
+    request = RequestFactory().get("/")
+    request.user = superuser
+    request.session = {}
+    request._messages = FallbackStorage(request)
+    return request
+
+
+def test_paginator_estimated_count():
+    paginator = EstimatedCountPaginator(Notification.objects.order_by("-id"), 100)
+    with patch.object(EstimatedCountPaginator, "estimate_count", return_value=50000):
+        assert paginator.count == 50000
+
+
+def test_paginator_small_table(notification):
+    paginator = EstimatedCountPaginator(Notification.objects.order_by("-id"), 100)
+    assert paginator.estimate_count() < paginator.threshold
+    assert paginator.count == 1
+
+
+def test_paginator_filtered():
+    paginator = EstimatedCountPaginator(Notification.objects.filter(status="sent").order_by("-id"), 100)
+    with patch.object(EstimatedCountPaginator, "estimate_count") as mock_estimate:
+        assert paginator.count == 0
+    mock_estimate.assert_not_called()
+
+
+def test_search_recipients(notification_admin, admin_request, email_template):
+    match = NotificationFactory(template_name=email_template.name, recipients=["joe@example.com"])
+    NotificationFactory(template_name=email_template.name, recipients=["joey@example.com"])
+    queryset, use_distinct = notification_admin.get_search_results(
+        admin_request, Notification.objects.all(), " joe@example.com "
+    )
+    assert list(queryset) == [match]
+    assert not use_distinct
+
+
+def test_changelist(notification_admin, superuser, notification):
+    admin_request = RequestFactory().get("/", {"template_name": notification.template_name})
+    admin_request.user = superuser
+    changelist = notification_admin.get_changelist_instance(admin_request)
+    assert isinstance(changelist, ChangeList)
+    assert list(changelist.result_list) == [notification]
+
+
+def test_changelist_keyset_pagination(notification_admin, superuser, email_template):
+    notifications = NotificationFactory.create_batch(5, template_name=email_template.name)[::-1]
+    notification_admin.list_per_page = 2
+    admin_request = RequestFactory().get("/")
+    admin_request.user = superuser
+    changelist = notification_admin.get_changelist_instance(admin_request)
+    assert list(changelist.result_list) == notifications[:2]
+    next_page = changelist.get_query_string({PAGE_VAR: changelist.page_num + 1})
+    assert "after={}".format(notifications[1].pk) in next_page
+    assert "after" not in changelist.get_query_string({"status": "sent"})
+
+    admin_request = RequestFactory().get("/" + next_page)
+    admin_request.user = superuser
+    changelist = notification_admin.get_changelist_instance(admin_request)
+    with CaptureQueriesContext(connection) as queries:
+        assert list(changelist.result_list) == notifications[2:4]
+    assert "OFFSET" not in queries[-1]["sql"]
+
+
+def test_resend_batches(notification, django_assert_num_queries):
+    NotificationFactory.create_batch(4)
+    # 3 batches of ids, then the end
+    with django_assert_num_queries(7):
+        assert Notification.objects.resend(batch_size=2) == 5
+    assert Notification.objects.filter(status=Notification.STATUS.pending).count() == 5
+
+
+def test_resend(notification_admin, admin_request, notification):
+    notification_admin.resend(admin_request, Notification.objects.all())
+    notification.refresh_from_db()
+    assert notification.status == Notification.STATUS.pending
+
+
+def test_cancel(notification_admin, admin_request, email_template):
+    pending = NotificationFactory(template_name=email_template.name, status=Notification.STATUS.pending)
+    sent = NotificationFactory(template_name=email_template.name, status=Notification.STATUS.sent)
+    notification_admin.cancel(admin_request, Notification.objects.all())
+    pending.refresh_from_db()
+    assert pending.status == Notification.STATUS.cancelled
+    sent.refresh_from_db()
+    assert sent.status == Notification.STATUS.sent
@@ -0,0 +1,100 @@
+from post_office.models import Email
+
+import pytest
+from unittest.mock import patch
+
+from tests.factories import SuppressedAddressFactory, UserFactory
+from unicef_notification.models import Notification, SendCheckpoint
+from unicef_notification.utils import send_notification_to_queryset
+
+from demo.sample.models import Author
+
+pytestmark = pytest.mark.django_db
+
+
+def test_send_to_queryset(email_template, django_capture_on_commit_callbacks):
+    users = [UserFactory() for i in range(5)]
+    users[0].email = ""
+    users[0].save()
+    with django_capture_on_commit_callbacks(execute=True):
+        count = send_notification_to_queryset(
+            type(users[0]).objects.all(),
+            email_template.name,
+            context={"shared": 1},
+            get_context=lambda user: {"username": user.username},
+            chunk_size=2,
+        )
+    assert count == 4
+    notifications = Notification.objects.order_by("pk")
+    assert [n.recipients for n in notifications] == [[u.email] for u in users[1:]]
+    assert notifications[0].template_data == {"shared": 1, "username": users[1].username}
+    assert all(n.status == Notification.STATUS.sent for n in notifications)
+    assert Email.objects.count() == 4
+
+
+def test_send_to_queryset_address_callable(email_template):
+    Author.objects.create(name="joe")
+    count = send_notification_to_queryset(
+        Author.objects.all(),
+        email_template.name,
+        address=lambda author: ["{}@example.com".format(author.name)],
+        queued=True,
+    )
+    assert count == 1
+    notification = Notification.objects.get()
+    assert notification.recipients == ["joe@example.com"]
+    assert notification.status == Notification.STATUS.pending
+
+
+def test_send_to_queryset_suppressed(email_template, django_capture_on_commit_callbacks):
+    user = UserFactory()
+    SuppressedAddressFactory(address=user.email)
+    with django_capture_on_commit_callbacks(execute=True):
+        send_notification_to_queryset(type(user).objects.all(), email_template.name)
+    notification = Notification.objects.get()
+    assert notification.recipients == []
+    assert notification.suppressed_recipients == [user.email]
+    # nobody left to send to
+    assert notification.status == Notification.STATUS.suppressed
+    assert not Email.objects.exists()
+
+
+def test_send_to_queryset_resume(email_template, django_capture_on_commit_callbacks):
+    users = [UserFactory() for i in range(4)]
+    queryset = type(users[0]).objects.all()
+    with patch("unicef_notification.utils.provide_context", side_effect=[{}, {}, RuntimeError()]):
+        with django_capture_on_commit_callbacks(execute=True):
+            with pytest.raises(RuntimeError):
+                send_notification_to_queryset(
+                    queryset, email_template.name, chunk_size=2, checkpoint="run"
+                )
+    # the first chunk was saved and sent, the second one was not saved
+    assert list(Notification.objects.values_list("status", flat=True)) == [
+        Notification.STATUS.sent
+    ] * 2
+    checkpoint = SendCheckpoint.objects.get(name="run")
+    assert checkpoint.last_pk == str(users[1].pk)
+    assert checkpoint.count == 2
+
+    with django_capture_on_commit_callbacks(execute=True):
+        count = send_notification_to_queryset(
+            queryset, email_template.name, chunk_size=2, checkpoint="run"
+        )
+    assert count == 2
+    recipients = [n.recipients[0] for n in Notification.objects.order_by("pk")]
+    assert recipients == [u.email for u in users]
+    assert Email.objects.count() == 4
+    checkpoint.refresh_from_db()
+    assert checkpoint.count == 4
+
+
+def test_send_to_queryset_sent_on_commit(email_template, django_capture_on_commit_callbacks):
+    users = UserFactory.create_batch(2)
+    with django_capture_on_commit_callbacks() as callbacks:
+        send_notification_to_queryset(type(users[0]).objects.all(), email_template.name)
+    # saved, but not sent before the transaction commits
+    assert Notification.objects.count() == 2
+    assert not Email.objects.exists()
+    for callback in callbacks:
+        callback()
+    assert Email.objects.count() == 2
@@ -0,0 +1,87 @@
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from post_office.models import Email
+
+import pytest
+from unittest.mock import patch
+
+from unicef_notification import suppression
+from unicef_notification.batch import get_current_batch, notification_batch
+from unicef_notification.models import Notification
+from unicef_notification.utils import send_notification, send_notification_with_template
+
+pytestmark = pytest.mark.django_db
+
+
+def test_batch_flush_on_commit(django_capture_on_commit_callbacks, email_template):
+    with django_capture_on_commit_callbacks(execute=True):
+        with notification_batch() as batch:
+            for i in range(3):
+                send_notification_with_template(
+                    ["test{}@example.com".format(i)], email_template.name, {}
+                )
+            assert get_current_batch() is batch
+            # nothing is saved or sent until commit
+            assert Notification.objects.count() == 0
+        assert get_current_batch() is None
+        assert Notification.objects.count() == 0
+    assert Notification.objects.count() == 3
+    assert Email.objects.count() == 3
+    assert not Notification.objects.filter(sent_email__isnull=True).exists()
+
+
+@patch("unicef_notification.models.mail")
+def test_batch_send_notification(mock_mail, django_capture_on_commit_callbacks):
+    mock_mail.send.return_value = Email.objects.create(from_email="from@example.com")
+    with django_capture_on_commit_callbacks(execute=True):
+        with notification_batch():
+            send_notification(["test@example.com"], subject="Hello")
+            mock_mail.send.assert_not_called()
+    mock_mail.send.assert_called_once()
+    notification = Notification.objects.get()
+    assert notification.sent_recipients == ["test@example.com"]
+
+
+def test_batch_send_disabled(django_capture_on_commit_callbacks, email_template):
+    with django_capture_on_commit_callbacks(execute=True):
+        with notification_batch():
+            send_notification_with_template(
+                ["test@example.com"], email_template.name, {}, send_disabled=True
+            )
+    notification = Notification.objects.get()
+    assert notification.sent_email is None
+    assert notification.sender_email
+    assert Email.objects.count() == 0
+
+
+def test_batch_rollback(django_capture_on_commit_callbacks, email_template):
+    with django_capture_on_commit_callbacks(execute=True) as callbacks:
+        try:
+            with transaction.atomic():
+                with notification_batch():
+                    send_notification_with_template(
+                        ["test@example.com"], email_template.name, {}
+                    )
+                raise RuntimeError()
+        except RuntimeError:
+            pass
+    assert callbacks == []
+    assert Notification.objects.count() == 0
+    assert Email.objects.count() == 0
+
+
+def test_batch_validates_on_add(email_template):
+    with pytest.raises(ValidationError):
+        with notification_batch():
+            send_notification_with_template(["test@example.com"], "wrong", {})
+
+
+def test_batch_validates_template_once(django_assert_num_queries, email_template):
+    suppression.get_suppressed_addresses()
+    with notification_batch():
+        with django_assert_num_queries(1):
+            for i in range(3):
+                send_notification_with_template(
+                    ["test@example.com"], email_template.name, {}
+                )
@@ -0,0 +1,116 @@
+import datetime
+
+from django.apps import apps
+from django.template.loader import get_template
+from django.utils import timezone
+
+from post_office.models import EmailTemplate
+
+import pytest
+from unittest.mock import patch
+
+from tests.factories import EmailTemplateFactory
+from unicef_notification import cache, loaders, validations
+
+pytestmark = pytest.mark.django_db
+
+
+def test_preload_templates(django_assert_num_queries, email_template):
+    with django_assert_num_queries(1):
+        assert cache.preload_templates() == 2
+    assert cache.is_known_template_name(email_template.name)
+    assert cache.is_known_template_name("test_base")
+
+
+def test_preload_templates_validate(django_assert_num_queries, email_template):
+    cache.preload_templates()
+    with django_assert_num_queries(0):
+        assert validations.validate_template_name(email_template.name) is None
+
+
+def test_preload_templates_compiled(django_assert_num_queries, email_template):
+    cache.preload_templates()
+    template_name = "{}{}".format(loaders.EMAIL_TEMPLATE_PREFIX, email_template.name)
+    with django_assert_num_queries(0):
+        content = get_template(template_name).render({})
+    assert "Base template" in content
+    assert "Template1" in content
+
+
+def test_preload_templates_syntax_error(email_template):
+    EmailTemplateFactory(name="broken", html_content="{% if %}")
+    assert cache.preload_templates() == 3
+    assert cache.is_known_template_name("broken")
+
+
+def test_invalidate_on_save(email_template):
+    cache.preload_templates()
+    email_template.html_content = "<p>Changed</p>"
+    email_template.save()
+    assert not cache.is_known_template_name(email_template.name)
+    template_name = "{}{}".format(loaders.EMAIL_TEMPLATE_PREFIX, email_template.name)
+    for loader in cache.get_email_template_loaders():
+        assert template_name not in loader.compiled_templates
+
+
+def test_invalidate_on_delete(email_template):
+    cache.preload_templates()
+    email_template.delete()
+    assert not cache.is_known_template_name(email_template.name)
+
+
+def test_preload_changed_by_other_process(settings, email_template):
+    cache.preload_templates()
+    template_name = "{}{}".format(loaders.EMAIL_TEMPLATE_PREFIX, email_template.name)
+    # a change made by another process does not send signals to this one
+    EmailTemplate.objects.filter(pk=email_template.pk).update(
+        html_content="<p>Changed</p>",
+        last_updated=timezone.now() + datetime.timedelta(seconds=1),
+    )
+    assert "Template1" in get_template(template_name).render({})
+    settings.UNICEF_NOTIFICATION_PRELOAD_TTL = 0
+    assert get_template(template_name).render({}) == "<p>Changed</p>"
+    assert not cache.is_known_template_name(email_template.name)
+
+
+def test_preload_revalidate_deleted(email_template):
+    cache.preload_templates()
+    template_name = "{}{}".format(loaders.EMAIL_TEMPLATE_PREFIX, email_template.name)
+    (loader,) = cache.get_email_template_loaders()
+    compiled = loader.compiled_templates[template_name]
+    email_template.delete()
+    assert loader.revalidate(template_name, compiled) is None
+    assert template_name not in loader.compiled_templates
+
+
+def test_preload_revalidate_unchanged(settings, django_assert_num_queries, email_template):
+    cache.preload_templates()
+    settings.UNICEF_NOTIFICATION_PRELOAD_TTL = 0
+    template_name = "{}{}".format(loaders.EMAIL_TEMPLATE_PREFIX, email_template.name)
+    (loader,) = cache.get_email_template_loaders()
+    compiled = loader.compiled_templates[template_name]
+    # one query per template checked
+    with django_assert_num_queries(1):
+        assert loader.get_template(template_name) is compiled.template
+
+
+def test_clear(email_template):
+    cache.preload_templates()
+    cache.clear()
+    assert not cache.is_known_template_name(email_template.name)
+    for loader in cache.get_email_template_loaders():
+        assert loader.compiled_templates == {}
+
+
+def test_ready_preload(settings):
+    settings.UNICEF_NOTIFICATION_PRELOAD_TEMPLATES = True
+    with patch("unicef_notification.cache.preload_templates") as mock_preload:
+        apps.get_app_config("unicef_notification").ready()
+    mock_preload.assert_called_once()
+
+
+def test_ready_preload_disabled(settings):
+    settings.UNICEF_NOTIFICATION_PRELOAD_TEMPLATES = False
+    with patch("unicef_notification.cache.preload_templates") as mock_preload:
+        apps.get_app_config("unicef_notification").ready()
+    mock_preload.assert_not_called()
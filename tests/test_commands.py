@@ -1,9 +1,19 @@
-from django.core.management import call_command
+import datetime
 
-from post_office.models import EmailTemplate
+from django.conf import settings
+from django.core.management import call_command, CommandError
+from django.db import connections
+from django.utils import timezone
+
+from post_office.models import EmailTemplate, PRIORITY
 
 import pytest
 
+from tests.factories import NotificationFactory, UserFactory
+from unicef_notification.indexes import TEMPLATE_DATA_INDEX
+from unicef_notification.management.commands.update_notifications import Command, LOCK_KEY
+from unicef_notification.models import Notification, NotificationSummary, TemplateSync
+
 pytestmark = pytest.mark.django_db
 
 
@@ -11,4 +21,157 @@ def test_update_notifications():
     email_qs = EmailTemplate.objects
     init_count = email_qs.count()
     call_command("update_notifications")
-    assert email_qs.count() == init_count + 1
+    assert email_qs.count() == init_count + 3
+    translated = email_qs.get(name="author-translated", language="fr")
+    assert translated.subject == "Nouvel auteur"
+    assert translated.default_template == email_qs.get(name="author-translated", language="")
+    # running again updates the same templates
+    call_command("update_notifications")
+    assert email_qs.count() == init_count + 3
+
+
+def test_update_notifications_existing_variant():
+    EmailTemplate.objects.create(name="author-translated", language="fr", subject="Old")
+    call_command("update_notifications")
+    translated = EmailTemplate.objects.get(name="author-translated", language="fr")
+    assert translated.subject == "Nouvel auteur"
+    assert translated.default_template == EmailTemplate.objects.get(
+        name="author-translated", language=""
+    )
+
+
+def test_update_notifications_lock():
+    call_command("update_notifications")
+    assert TemplateSync.objects.get(name=TemplateSync.UPDATE_NOTIFICATIONS).content_hash
+    EmailTemplate.objects.filter(name="author-translated", language="").update(subject="Edited")
+    # templates are up to date, the sync is skipped
+    call_command("update_notifications", lock=True)
+    assert EmailTemplate.objects.get(name="author-translated", language="").subject == "Edited"
+    call_command("update_notifications", lock=True, force=True)
+    assert EmailTemplate.objects.get(name="author-translated", language="").subject != "Edited"
+
+
+def test_update_notifications_lock_held():
+    assert not TemplateSync.objects.exists()
+    other = connections.create_connection("default")
+    try:
+        with other.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_lock(%s)", [LOCK_KEY])
+        call_command("update_notifications", lock=True, lock_timeout=0)
+        assert not TemplateSync.objects.exists()
+        call_command("update_notifications", lock=True, lock_timeout=0.1)
+        assert not TemplateSync.objects.exists()
+    finally:
+        other.close()
+    call_command("update_notifications", lock=True, lock_timeout=0)
+    assert TemplateSync.objects.exists()
+
+
+def test_update_notifications_lock_timeout_reset():
+    with connections["default"].cursor() as cursor:
+        cursor.execute("SHOW lock_timeout")
+        previous = cursor.fetchone()[0]
+        assert Command().acquire_lock(timeout=5)
+        # the row locks of the sync do not time out
+        cursor.execute("SHOW lock_timeout")
+        assert cursor.fetchone()[0] == previous
+
+
+def test_backfill_sender_email(django_assert_num_queries):
+    user = UserFactory()
+    from_address = "from@example.com"
+    notifications = [
+        NotificationFactory(sender=user),
+        NotificationFactory(from_address=from_address),
+        NotificationFactory(),
+    ]
+    Notification.objects.update(sender_email="")
+    # select, prefetch senders (user and author), bulk update, final select
+    with django_assert_num_queries(5):
+        call_command("backfill_sender_email")
+    expected = [user.email, from_address, settings.DEFAULT_FROM_EMAIL]
+    for notification, sender_email in zip(notifications, expected):
+        notification.refresh_from_db()
+        assert notification.sender_email == sender_email
+
+
+def test_send_notifications(email_template):
+    notifications = [
+        NotificationFactory(
+            template_name=email_template.name,
+            status=Notification.STATUS.pending,
+            priority=priority,
+        )
+        for priority in (PRIORITY.low, PRIORITY.high)
+    ]
+    call_command("send_notifications", priority=["high"])
+    assert list(Notification.objects.pending()) == notifications[:1]
+    call_command("send_notifications", batch_size=1)
+    assert not Notification.objects.pending().exists()
+
+
+def test_schedule_notifications(email_template):
+    now = timezone.now()
+    due = NotificationFactory(
+        template_name=email_template.name,
+        status=Notification.STATUS.scheduled,
+        send_at=now - datetime.timedelta(minutes=1),
+    )
+    future = NotificationFactory(
+        template_name=email_template.name,
+        status=Notification.STATUS.scheduled,
+        send_at=now + datetime.timedelta(days=1),
+    )
+    call_command("schedule_notifications", batch_size=1)
+    due.refresh_from_db()
+    assert due.status == Notification.STATUS.pending
+    future.refresh_from_db()
+    assert future.status == Notification.STATUS.scheduled
+
+
+def test_send_notifications_shard(email_template):
+    NotificationFactory(template_name=email_template.name, status=Notification.STATUS.pending)
+    call_command("send_notifications", shards=2, shard=0, lease=60)
+    call_command("send_notifications", shards=2, shard=1, lease=60)
+    assert not Notification.objects.pending().exists()
+
+
+def test_send_notifications_shard_invalid():
+    with pytest.raises(CommandError):
+        call_command("send_notifications", shards=2, shard=2)
+
+
+def test_summarize_notifications():
+    NotificationFactory.create_batch(2)
+    call_command("summarize_notifications")
+    assert NotificationSummary.objects.get().count == 2
+    NotificationFactory()
+    call_command("summarize_notifications", full=True)
+    assert NotificationSummary.objects.get().count == 3
+
+
+def test_archive_notifications():
+    notification = NotificationFactory(html_message="<p>Html</p>", status=Notification.STATUS.sent)
+    Notification.objects.update(created=timezone.now() - datetime.timedelta(days=10))
+    call_command("archive_notifications", days=30)
+    assert not Notification.objects.filter(archived=True).exists()
+    call_command("archive_notifications", days=7)
+    notification = Notification.objects.get(archived=True)
+    assert notification.html_message == "<p>Html</p>"
+
+
+def _template_data_index_exists():
+    with connections["default"].cursor() as cursor:
+        cursor.execute("SELECT to_regclass(%s) IS NOT NULL", [TEMPLATE_DATA_INDEX])
+        return cursor.fetchone()[0]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_template_data_index():
+    # opt-in, not created by the migrations
+    assert not _template_data_index_exists()
+    call_command("template_data_index")
+    assert _template_data_index_exists()
+    call_command("template_data_index")
+    call_command("template_data_index", drop=True)
+    assert not _template_data_index_exists()
@@ -0,0 +1,88 @@
+from django.core.management import call_command
+
+import pytest
+
+from tests.factories import AuthorFactory, SuppressedAddressFactory
+from unicef_notification import context
+from unicef_notification.batch import notification_batch
+from unicef_notification.models import Notification
+from unicef_notification.utils import send_notification_to_queryset, send_notification_with_template
+
+from demo.sample.models import Author
+
+pytestmark = pytest.mark.django_db
+
+
+def test_memo():
+    memo = context.ContextMemo()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return "value"
+
+    assert memo.get("key", compute) == "value"
+    assert memo.get("key", compute) == "value"
+    assert len(calls) == 1
+
+
+def test_memo_serialize(author):
+    memo = context.ContextMemo()
+    serialized = memo.serialize(author)
+    assert serialized["name"] == author.name
+    assert memo.serialize(author) is serialized
+
+
+def test_discovered_provider():
+    # from the context_provider of the author-new definition module
+    assert context.get_context_provider("author-new").__name__ == "author_context"
+    assert context.get_context_provider("author-translated") is None
+
+
+def test_register_context_provider():
+    context.register_context_provider("greeting", lambda ctx, memo: {"name": "Joe"})
+    assert context.provide_context("greeting", {"a": 1}, context.ContextMemo()) == {
+        "a": 1,
+        "name": "Joe",
+    }
+    assert context.provide_context("other", {"a": 1}, context.ContextMemo()) == {"a": 1}
+
+
+def test_batch(django_assert_num_queries, django_capture_on_commit_callbacks):
+    call_command("update_notifications")
+    author = AuthorFactory(name="Jane")
+    SuppressedAddressFactory()
+    with django_capture_on_commit_callbacks(execute=True):
+        with notification_batch():
+            # the suppressed addresses, the template name validation,
+            # and the author, fetched once for the batch
+            with django_assert_num_queries(3):
+                for i in range(5):
+                    send_notification_with_template(
+                        ["user{}@example.com".format(i)],
+                        "author-new",
+                        {"author_id": author.pk},
+                        send_disabled=True,
+                    )
+    notifications = Notification.objects.filter(template_data__author_id=author.pk)
+    assert notifications.count() == 5
+    assert {n.template_data["author"] for n in notifications} == {"Jane"}
+
+
+def test_send_notification_to_queryset():
+    call_command("update_notifications")
+    authors = AuthorFactory.create_batch(4)
+    author = AuthorFactory(name="Jane")
+    sent = send_notification_to_queryset(
+        Author.objects.filter(pk__in=[a.pk for a in authors]),
+        "author-new",
+        address=lambda obj: "{}@example.com".format(obj.pk),
+        context={"author_id": author.pk},
+        queued=True,
+    )
+    assert sent == 4
+    assert set(
+        Notification.objects.filter(template_data__author_id=author.pk).values_list(
+            "template_data__author", flat=True
+        )
+    ) == {"Jane"}
@@ -0,0 +1,39 @@
+import os
+import subprocess
+import sys
+
+import unicef_notification
+
+# modules the public entry points must not import until they are used
+DEFERRED_MODULES = (
+    "django.contrib.postgres",
+    "django.core.serializers",
+    "django.db.models",
+    "post_office",
+    "unicef_notification.models",
+)
+
+SCRIPT = """
+import sys
+import unicef_notification.loaders
+import unicef_notification.utils
+from django.conf import settings
+
+assert not settings.configured, "settings read on import"
+for name in sys.argv[1:]:
+    loaded = [m for m in sys.modules if m == name or m.startswith(name + ".")]
+    assert not loaded, "imported %s" % loaded
+"""
+
+
+def test_import_is_lazy():
+    env = dict(os.environ)
+    env.pop("DJANGO_SETTINGS_MODULE", None)
+    env["PYTHONPATH"] = os.path.dirname(os.path.dirname(unicef_notification.__file__))
+    result = subprocess.run(
+        [sys.executable, "-c", SCRIPT, *DEFERRED_MODULES],
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    assert result.returncode == 0, result.stderr
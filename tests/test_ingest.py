@@ -0,0 +1,107 @@
+import datetime
+import json
+
+from django.db import connection
+from django.utils import timezone
+
+import pytest
+from unittest.mock import patch
+
+from tests.factories import UserFactory
+from unicef_notification import ingest
+from unicef_notification.models import Notification
+
+pytestmark = pytest.mark.django_db
+
+
+def build(count, **kwargs):
+    for i in range(count):
+        yield Notification(
+            method_type=Notification.TYPE_EMAIL,
+            recipients=["user{}@example.com".format(i)],
+            template_name="",
+            **kwargs,
+        )
+
+
+def test_format_value():
+    field = Notification._meta.get_field("recipients")
+    assert ingest.format_value(field, ['a"b', "c\\d", None]) == '{"a\\\\"b","c\\\\\\\\d",NULL}'
+    assert ingest.format_value(field, None) == "\\N"
+    field = Notification._meta.get_field("subject")
+    assert ingest.format_value(field, "line\nnext\ttab") == "line\\nnext\\ttab"
+
+
+def test_row_reader():
+    reader = ingest.RowReader(iter(["abc\n", "de\n"]))
+    assert reader.read(2) == "ab"
+    assert reader.read(4) == "c\nde"
+    assert reader.read() == "\n"
+    assert reader.read(10) == ""
+
+
+def test_copy_create():
+    sender = UserFactory()
+    send_at = timezone.now() + datetime.timedelta(days=1)
+    context = {"name": "Joe \"Tab\"\t", "nested": {"n": [1, 2]}}
+    notifications = build(
+        5,
+        sender=sender,
+        template_data=context,
+        subject="Hello\\world\n",
+        priority=2,
+        send_at=send_at,
+        status=Notification.STATUS.scheduled,
+    )
+    ids = Notification.objects.copy_create(notifications, batch_size=2)
+    assert len(ids) == 5
+    assert list(Notification.objects.order_by("id").values_list("id", flat=True)) == ids
+
+    notification = Notification.objects.get(pk=ids[-1])
+    assert notification.recipients == ["user4@example.com"]
+    assert notification.template_data == context
+    assert notification.subject == "Hello\\world\n"
+    assert notification.sender == sender
+    assert notification.sender_email == sender.email
+    assert notification.send_at == send_at
+    assert notification.status == Notification.STATUS.scheduled
+    assert notification.created is not None
+    assert notification.cc == []
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT DISTINCT jsonb_typeof(template_data) FROM unicef_notification_notification"
+        )
+        assert cursor.fetchall() == [("object",)]
+    # the sequence is past the reserved ids
+    assert Notification.objects.create(
+        method_type=Notification.TYPE_EMAIL, recipients=["a@example.com"]
+    ).pk > ids[-1]
+
+
+def test_copy_create_json_prep_value():
+    # before Django 4.2, JSONField.get_prep_value returns the dumped value
+    with patch.object(
+        Notification._meta.get_field("template_data"), "get_prep_value", json.dumps
+    ):
+        ids = Notification.objects.copy_create(build(1, template_data={"name": "Joe"}))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT jsonb_typeof(template_data) FROM unicef_notification_notification WHERE id = %s",
+            ids,
+        )
+        assert cursor.fetchone() == ("object",)
+    assert Notification.objects.get(pk=ids[0]).template_data == {"name": "Joe"}
+
+
+def test_copy_create_sets_objects():
+    notifications = list(build(3, template_data=None))
+    ids = Notification.objects.copy_create(notifications)
+    assert [n.pk for n in notifications] == ids
+    assert not notifications[0]._state.adding
+    assert Notification.objects.get(pk=ids[0]).template_data is None
+
+
+def test_copy_create_fallback():
+    with patch.object(connection, "vendor", "sqlite"):
+        ids = Notification.objects.copy_create(build(3), batch_size=2)
+    assert Notification.objects.filter(pk__in=ids).count() == 3
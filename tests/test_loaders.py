@@ -34,6 +34,14 @@ def test_get_template_sources(email_template):
     assert len(list(templates)) == 1
 
 
+def test_get_template_sources_prefix_setting(settings, email_template):
+    settings.UNICEF_NOTIFICATION_EMAIL_TEMPLATE_PREFIX = "custom/"
+    loader = loaders.EmailTemplateLoader(engine=None)
+    assert loaders.EMAIL_TEMPLATE_PREFIX == "custom/"
+    (origin,) = loader.get_template_sources(template_name="custom/{}".format(email_template.name))
+    assert origin.name == email_template.name
+
+
 def test_get_template_sources_invalid():
     loader = loaders.EmailTemplateLoader(engine=None)
     templates = loader.get_template_sources(template_name="wrong/template")
@@ -0,0 +1,106 @@
+from django.core.exceptions import ValidationError
+
+from post_office.models import Email
+
+import pytest
+
+from tests.factories import EmailTemplateFactory
+from unicef_notification import validations
+from unicef_notification.models import Notification
+from unicef_notification.utils import send_localized_notification_with_template, send_notification_with_template
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def greeting_templates():
+    default = EmailTemplateFactory(name="greeting", subject="Hello", content="Hello")
+    EmailTemplateFactory(
+        name="greeting",
+        language="fr",
+        default_template=default,
+        subject="Bonjour",
+        content="Bonjour",
+    )
+    EmailTemplateFactory(
+        name="greeting",
+        language="es",
+        default_template=default,
+        subject="Hola",
+        content="Hola",
+    )
+    return default
+
+
+def test_validate_template_name_translated(greeting_templates):
+    assert validations.validate_template_name("greeting") is None
+
+
+def test_validate_template_name_language(greeting_templates):
+    assert validations.validate_template_name("greeting", "fr") is None
+    with pytest.raises(ValidationError):
+        validations.validate_template_name("greeting", "de")
+
+
+def test_send_with_missing_language(greeting_templates):
+    with pytest.raises(ValidationError):
+        send_notification_with_template(["test@example.com"], "greeting", {}, language="de")
+    assert not Notification.objects.exists()
+
+
+def test_send_with_language(greeting_templates):
+    send_notification_with_template(["test@example.com"], "greeting", {}, language="fr")
+    notification = Notification.objects.get()
+    assert notification.language == "fr"
+    assert notification.sent_email.subject == "Bonjour"
+
+
+def test_send_localized(django_capture_on_commit_callbacks, greeting_templates):
+    languages = {
+        "jean@example.com": "fr",
+        "marie@example.com": "fr",
+        "juan@example.com": "es",
+        "hans@example.com": "de",
+    }
+    with django_capture_on_commit_callbacks(execute=True):
+        sent_languages = send_localized_notification_with_template(
+            list(languages) + ["joe@example.com"],
+            "greeting",
+            {},
+            languages=languages,
+        )
+    assert sorted(sent_languages) == ["", "es", "fr"]
+    notifications = {n.language: n for n in Notification.objects.all()}
+    assert notifications["fr"].recipients == ["jean@example.com", "marie@example.com"]
+    assert notifications["fr"].sent_email.subject == "Bonjour"
+    assert notifications["es"].sent_email.subject == "Hola"
+    # no german variant, so the default one is used
+    assert notifications[""].recipients == ["hans@example.com", "joe@example.com"]
+    assert notifications[""].sent_email.subject == "Hello"
+    assert Email.objects.count() == 3
+
+
+def test_send_localized_callable(django_capture_on_commit_callbacks, greeting_templates):
+    with django_capture_on_commit_callbacks(execute=True):
+        send_localized_notification_with_template(
+            ["jean@example.fr"],
+            "greeting",
+            {},
+            languages=lambda email: email.rsplit(".", 1)[-1],
+        )
+    assert Notification.objects.get().language == "fr"
+
+
+def test_send_localized_queries(django_assert_num_queries, greeting_templates):
+    send_localized_notification_with_template(
+        ["jean@example.com"], "greeting", {}, languages={}
+    )
+    with django_assert_num_queries(0):
+        validations.validate_template_name("greeting")
+
+
+def test_send_localized_missing_template():
+    with pytest.raises(ValidationError):
+        send_localized_notification_with_template(
+            ["jean@example.com"], "missing", {}, languages={}
+        )
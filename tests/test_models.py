@@ -1,13 +1,21 @@
+import datetime
+from smtplib import SMTPException
+
 from django.conf import settings
 from django.core.exceptions import ValidationError
+from django.core.mail import get_connection
+from django.core.mail.backends import locmem
+from django.core.management import call_command
+from django.db import connection
+from django.utils import timezone
 
-from post_office.models import Email
+from post_office.models import Email, PRIORITY, STATUS
 
 import pytest
 from unittest.mock import patch
 
 from tests.factories import AuthorFactory, NotificationFactory, UserFactory
-from unicef_notification.models import Notification
+from unicef_notification.models import Notification, NotificationArchive, NotificationSummary
 from unicef_notification.utils import serialize_dict
 
 from demo.sample.models import Author
@@ -90,9 +98,12 @@ def test_success(mock_mail):
         html_message="",
         message="",
         subject="",
+        priority=PRIORITY.medium,
+        language="",
     )
     # we marked the recipients as sent
     assert notification.recipients + cc == notification.sent_recipients
+    assert notification.status == Notification.STATUS.sent
 
 
 @patch("unicef_notification.models.mail")
@@ -181,3 +192,358 @@ def test_ignore_mail_sending_error(mock_mail):
     mock_logger.exception.assert_called_with("Failed to send mail.")
     # recipients weren't marked as successful
     assert notification.sent_recipients == []
+    assert notification.status == Notification.STATUS.failed
+
+
+@patch("unicef_notification.models.mail")
+def test_send_mail_priority(mock_mail):
+    notification = NotificationFactory(priority=PRIORITY.high)
+    mock_mail.send.return_value = Email()
+    with patch.object(Notification, "save"):
+        notification.send_mail()
+    call_kwargs = mock_mail.send.call_args[1]
+    assert PRIORITY.high == call_kwargs["priority"]
+
+
+def test_send_pending(email_template):
+    low = NotificationFactory(
+        template_name=email_template.name,
+        status=Notification.STATUS.pending,
+        priority=PRIORITY.low,
+    )
+    high = NotificationFactory(
+        template_name=email_template.name,
+        status=Notification.STATUS.pending,
+        priority=PRIORITY.high,
+    )
+    draft = NotificationFactory(template_name=email_template.name)
+    assert list(Notification.objects.pending().queue_order()) == [high, low]
+
+    assert Notification.send_pending(batch_size=1) == 1
+    high.refresh_from_db()
+    assert high.status == Notification.STATUS.sent
+    assert high.sent_email.priority == PRIORITY.high
+    low.refresh_from_db()
+    assert low.status == Notification.STATUS.pending
+
+    assert Notification.send_pending(priorities=[PRIORITY.high]) == 0
+    assert Notification.send_pending() == 1
+    low.refresh_from_db()
+    assert low.status == Notification.STATUS.sent
+    draft.refresh_from_db()
+    assert draft.status == Notification.STATUS.draft
+
+
+def test_sender_email_resolved_on_create():
+    sender = UserFactory()
+    notification = NotificationFactory(sender=sender)
+    assert notification.sender_email == sender.email
+
+
+@patch("unicef_notification.models.mail")
+def test_send_mail_uses_sender_email(mock_mail, django_assert_num_queries):
+    "A stored notification is sent without fetching its sender."
+    sender = UserFactory()
+    notification = Notification.objects.get(pk=NotificationFactory(sender=sender).pk)
+    mock_mail.send.return_value = Email()
+    with patch.object(Notification, "save"):
+        with django_assert_num_queries(0):
+            notification.send_mail()
+    call_kwargs = mock_mail.send.call_args[1]
+    assert sender.email == call_kwargs["sender"]
+
+
+def test_send_bulk_reuses_connection(email_template, mailoutbox):
+    notifications = [
+        NotificationFactory(template_name=email_template.name, priority=PRIORITY.now)
+        for i in range(3)
+    ]
+    with patch(
+        "post_office.connections.get_connection", wraps=get_connection
+    ) as mock_connection:
+        sent = Notification.send_bulk(notifications)
+    assert sent == notifications
+    assert mock_connection.call_count == 1
+    assert len(mailoutbox) == 3
+    for notification in Notification.objects.all():
+        assert notification.status == Notification.STATUS.sent
+        assert notification.sent_email.status == STATUS.sent
+
+
+def test_default_priority(settings, email_template):
+    settings.POST_OFFICE = {"DEFAULT_PRIORITY": "high"}
+    low = NotificationFactory(status=Notification.STATUS.pending, priority=PRIORITY.low)
+    default = NotificationFactory(status=Notification.STATUS.pending)
+    assert default.priority == PRIORITY.high
+    # notifications created without priority are not left behind the others
+    assert list(Notification.objects.pending().queue_order()) == [default, low]
+
+
+def test_send_bulk_reconnects_on_error(email_template, mailoutbox):
+    notifications = [
+        NotificationFactory(template_name=email_template.name, priority=PRIORITY.now)
+        for i in range(3)
+    ]
+    send_messages = locmem.EmailBackend.send_messages
+    calls = []
+
+    def fail_once(backend, messages):
+        calls.append(messages)
+        if len(calls) == 1:
+            raise SMTPException()
+        return send_messages(backend, messages)
+
+    with patch.object(locmem.EmailBackend, "send_messages", fail_once):
+        with patch(
+            "post_office.connections.get_connection", wraps=get_connection
+        ) as mock_connection:
+            Notification.send_bulk(notifications)
+    assert mock_connection.call_count == 2
+    assert len(mailoutbox) == 2
+    notifications = Notification.objects.order_by("pk")
+    assert [n.sent_email.status for n in notifications] == [STATUS.failed, STATUS.sent, STATUS.sent]
+    # the notification of the failed email failed
+    assert [n.status for n in notifications] == [
+        Notification.STATUS.failed,
+        Notification.STATUS.sent,
+        Notification.STATUS.sent,
+    ]
+    assert notifications[0].sent_recipients == []
+
+
+def test_send_mail_email_failed(email_template):
+    notification = NotificationFactory(template_name=email_template.name, priority=PRIORITY.now)
+    with patch.object(locmem.EmailBackend, "send_messages", side_effect=SMTPException()):
+        assert not notification.send_mail()
+    notification.refresh_from_db()
+    assert notification.status == Notification.STATUS.failed
+    assert notification.sent_email.status == STATUS.failed
+
+
+def test_dispatch_mail_validates_recipients(email_template):
+    notification = NotificationFactory(
+        template_name=email_template.name, recipients=["invalid"], priority=PRIORITY.now
+    )
+    # mail.send validates the addresses of emails dispatched through the open connection
+    assert not notification.send_mail(disconnect_after_delivery=False)
+    assert notification.status == Notification.STATUS.failed
+    assert not Email.objects.exists()
+
+
+def test_send_pending_shard(email_template):
+    notifications = [
+        NotificationFactory(template_name=email_template.name, status=Notification.STATUS.pending)
+        for i in range(4)
+    ]
+    assert Notification.send_pending(shard=(notifications[0].pk % 2, 2)) == 2
+    sent = Notification.objects.filter(status=Notification.STATUS.sent)
+    assert sorted(sent.values_list("pk", flat=True)) == [n.pk for n in notifications[::2]]
+
+
+def test_send_pending_lease(email_template):
+    notification = NotificationFactory(
+        template_name=email_template.name, status=Notification.STATUS.pending
+    )
+    with patch.object(Notification, "send_bulk") as mock_send_bulk:
+        assert Notification.send_pending(lease=60, worker="worker1") == 1
+    mock_send_bulk.assert_called_once()
+    notification.refresh_from_db()
+    assert notification.leased_by == "worker1"
+    assert notification.lease_expires > timezone.now()
+    # the worker crashed before sending: the notification is leased...
+    assert Notification.send_pending(lease=60, worker="worker2") == 0
+    # ... until the lease expires
+    Notification.objects.update(lease_expires=timezone.now() - datetime.timedelta(seconds=1))
+    assert Notification.send_pending(lease=60, worker="worker2") == 1
+    notification.refresh_from_db()
+    assert notification.leased_by == "worker2"
+    assert notification.status == Notification.STATUS.sent
+
+
+def test_send_bulk_lease_expired(email_template):
+    notification = NotificationFactory(
+        template_name=email_template.name, status=Notification.STATUS.pending
+    )
+    lease_expires = timezone.now() - datetime.timedelta(seconds=1)
+    Notification.objects.update(lease_expires=lease_expires, leased_by="worker1")
+    notification.refresh_from_db()
+    assert Notification.send_bulk([notification], lease_expires=lease_expires, worker="worker1") == []
+    assert not Email.objects.exists()
+    notification.refresh_from_db()
+    assert notification.status == Notification.STATUS.pending
+
+
+def test_send_bulk_lease_claimed_again(email_template):
+    notification = NotificationFactory(
+        template_name=email_template.name, status=Notification.STATUS.pending
+    )
+    lease_expires = timezone.now() + datetime.timedelta(seconds=60)
+    notification.lease_expires = lease_expires
+    notification.leased_by = "worker1"
+    # the lease of worker1 expired while sending, and worker2 claimed the notification
+    Notification.objects.update(
+        lease_expires=lease_expires + datetime.timedelta(seconds=60), leased_by="worker2"
+    )
+    assert Notification.send_bulk([notification], lease_expires=lease_expires, worker="worker1")
+    notification.refresh_from_db()
+    assert notification.status == Notification.STATUS.pending
+    assert notification.leased_by == "worker2"
+
+
+def test_summarize():
+    now = timezone.now()
+    old = NotificationFactory(template_name="", status=Notification.STATUS.sent)
+    NotificationFactory.create_batch(2, status=Notification.STATUS.pending)
+    Notification.objects.filter(pk=old.pk).update(created=now - datetime.timedelta(days=5))
+
+    assert NotificationSummary.summarize() == 2
+    today = timezone.localdate()
+    totals = NotificationSummary.objects.totals("day", "status")
+    assert list(totals) == [
+        {"day": today - datetime.timedelta(days=5), "status": "sent", "count": 1},
+        {"day": today, "status": "pending", "count": 2},
+    ]
+
+    # only the days with changes are counted again
+    NotificationSummary.objects.filter(status="sent").update(count=99)
+    Notification.objects.exclude(pk=old.pk).update(status=Notification.STATUS.cancelled)
+    NotificationFactory(status=Notification.STATUS.pending)
+    assert NotificationSummary.summarize(margin=0) == 2
+    assert dict(
+        NotificationSummary.objects.between(start=today).totals("status").values_list(
+            "status", "count"
+        )
+    ) == {"cancelled": 2, "pending": 1}
+    assert NotificationSummary.objects.get(status="sent").count == 99
+    assert NotificationSummary.summarize(margin=0) == 0
+
+    # including the status changes of notifications created days before
+    Notification.objects.filter(pk=old.pk).update(status=Notification.STATUS.failed)
+    assert NotificationSummary.summarize(margin=0) == 1
+    assert NotificationSummary.objects.between(end=today - datetime.timedelta(days=1)).get().status == "failed"
+
+    NotificationSummary.summarize(full=True)
+    assert set(NotificationSummary.objects.values_list("status", flat=True)) == {
+        "cancelled",
+        "failed",
+        "pending",
+    }
+
+
+def test_status_changed():
+    notification = NotificationFactory()
+    notification.refresh_from_db()
+    created = notification.status_changed
+    assert created is not None
+    # other changes keep it, even from a stale instance
+    Notification.objects.filter(pk=notification.pk).update(subject="Changed")
+    notification.status_changed = None
+    notification.save()
+    notification.refresh_from_db()
+    assert notification.status_changed == created
+    notification.status = Notification.STATUS.cancelled
+    notification.save()
+    notification.refresh_from_db()
+    assert notification.status_changed > created
+
+
+def test_about():
+    author = AuthorFactory()
+    other = AuthorFactory()
+    notification = NotificationFactory(template_data=serialize_dict({"author": author}))
+    about_other = NotificationFactory(template_data=serialize_dict({"author": other}))
+    by_key = NotificationFactory(template_data=serialize_dict({"writer": author}))
+    assert list(Notification.objects.about(author, key="author")) == [notification]
+    assert list(Notification.objects.about(author, key="writer")) == [by_key]
+    assert list(Notification.objects.about(author, ["author", "writer"]).order_by("pk")) == [
+        notification,
+        by_key,
+    ]
+    assert list(Notification.objects.about(other, "author")) == [about_other]
+    assert not Notification.objects.about(author, []).exists()
+
+
+def test_about_uses_index():
+    call_command("template_data_index", blocking=True)
+    Notification.objects.copy_create(
+        Notification(
+            method_type=Notification.TYPE_EMAIL,
+            recipients=["joe@example.com"],
+            template_data={"author": {"model": "sample.author", "pk": pk}, "name": "Joe"},
+        )
+        for pk in range(2000)
+    )
+    with connection.cursor() as cursor:
+        # as autovacuum would, move the inserted rows out of the pending list of the index
+        cursor.execute(
+            "SELECT gin_clean_pending_list(%s::regclass)", ["notification_template_data_idx"]
+        )
+        cursor.execute("ANALYZE unicef_notification_notification")
+    author = Author(pk=42)
+    plan = Notification.objects.about(author, ["author", "writer"]).explain()
+    assert "Bitmap Index Scan on notification_template_data_idx" in plan
+    assert "Seq Scan" not in plan
+    assert Notification.objects.about(author, "author").count() == 1
+
+
+def test_archive(django_assert_num_queries):
+    old = timezone.now() - datetime.timedelta(days=200)
+    context = {"name": "Joe"}
+    archived = NotificationFactory(
+        template_data=context,
+        text_message="Text",
+        html_message="<p>Html</p>",
+        status=Notification.STATUS.sent,
+    )
+    pending = NotificationFactory(status=Notification.STATUS.pending)
+    recent = NotificationFactory(status=Notification.STATUS.sent)
+    Notification.objects.filter(pk__in=[archived.pk, pending.pk]).update(created=old)
+
+    before = timezone.now() - datetime.timedelta(days=180)
+    assert NotificationArchive.archive(before, batch_size=1) == 1
+    assert NotificationArchive.archive(before) == 0
+    assert Notification.objects.filter(archived=True).get() == archived
+    assert Notification.objects.values_list("text_message", "html_message", "template_data").get(
+        pk=archived.pk
+    ) == ("", "", None)
+    assert not Notification.objects.filter(pk__in=[pending.pk, recent.pk], archived=True).exists()
+
+    notification = Notification.objects.get(pk=archived.pk)
+    # one query for all the archived fields
+    with django_assert_num_queries(1):
+        assert notification.text_message == "Text"
+        assert notification.html_message == "<p>Html</p>"
+        assert notification.template_data == context
+
+    # saving keeps the content archived
+    notification.save()
+    assert Notification.objects.values_list("html_message", flat=True).get(pk=archived.pk) == ""
+    # content set again is stored in the notification
+    notification.html_message = "<p>New</p>"
+    notification.save()
+    assert Notification.objects.get(pk=archived.pk).html_message == "<p>New</p>"
+
+
+def test_archive_deferred_and_assigned():
+    notification = NotificationFactory(
+        text_message="Text", html_message="<p>Html</p>", status=Notification.STATUS.sent
+    )
+    Notification.objects.update(created=timezone.now() - datetime.timedelta(days=200))
+    NotificationArchive.archive(timezone.now())
+
+    # archived is loaded when deferred
+    assert Notification.objects.only("html_message").get().html_message == "<p>Html</p>"
+
+    notification = Notification.objects.get()
+    notification.refresh_from_db()
+    notification.save()
+    # refreshed from the row, the content stays archived
+    assert Notification.objects.values_list("html_message", flat=True).get() == ""
+
+    # an assigned value replaces the archived one, even if empty
+    notification.html_message = ""
+    assert notification.html_message == ""
+    notification.save()
+    notification = Notification.objects.get()
+    assert notification.html_message == ""
+    assert notification.text_message == "Text"
@@ -0,0 +1,93 @@
+import sys
+
+from django.core.management import call_command
+
+from post_office.models import EmailTemplate
+
+import pytest
+from unittest.mock import Mock, patch
+
+from unicef_notification import optimize
+from unicef_notification.models import TemplateSync
+
+HTML = """
+<html>
+    <head>
+        <style>p { color: red; }</style>
+    </head>
+    <body>
+        <!-- greeting -->
+        <!--[if mso]><p>Outlook</p><![endif]-->
+        <p>
+            Dear   {{ name }},
+        </p>
+        <pre>
+  keep   this
+        </pre>
+    </body>
+</html>
+"""
+
+
+def test_minify_html():
+    minified = optimize.minify_html(HTML)
+    assert "greeting" not in minified
+    assert "<!--[if mso]><p>Outlook</p><![endif]-->" in minified
+    assert "<p> Dear {{ name }}, </p>" in minified
+    assert "<pre>\n  keep   this\n        </pre>" in minified
+    assert len(minified) < len(HTML)
+
+
+def test_inline_css():
+    pytest.importorskip("premailer")
+    inlined = optimize.inline_css(HTML)
+    assert "<style" not in inlined
+    assert 'style="color:red"' in inlined
+
+
+@pytest.mark.parametrize(
+    "html",
+    [
+        '{% extends "email-templates/base" %}<style>p { color: red; }</style>',
+        '{% load i18n %}<style>p { color: red; }</style><p>{% trans "Hello" %}</p>',
+        "<style>td { color: red; }</style><table>{% for row in rows %}"
+        "<tr><td>{{ row }}</td></tr>{% endfor %}</table>",
+        '<style>a { color: red; }</style><a href="{{ url }}">Link</a>',
+        "<p>Hello</p>",
+    ],
+)
+def test_inline_css_skipped(html):
+    premailer = Mock()
+    with patch.dict(sys.modules, {"premailer": premailer}):
+        assert optimize.inline_css(html) == html
+    premailer.Premailer.assert_not_called()
+
+
+def test_inline_css_variables_in_text():
+    html = "<style>p { color: red; }</style><p>Dear {{ name }}</p>"
+    premailer = Mock()
+    with patch.dict(sys.modules, {"premailer": premailer}):
+        optimize.inline_css(html)
+    premailer.Premailer.assert_called_once()
+
+
+def test_optimize_defaults(settings):
+    defaults = {"subject": "Hello", "html_content": HTML}
+    assert optimize.optimize_defaults(defaults) is defaults
+    settings.UNICEF_NOTIFICATION_OPTIMIZE_HTML = True
+    optimized = optimize.optimize_defaults(defaults)
+    assert optimized["subject"] == "Hello"
+    assert len(optimized["html_content"]) < len(HTML)
+    assert optimize.optimize_defaults({"subject": "Hello"}) == {"subject": "Hello"}
+
+
+@pytest.mark.django_db
+def test_update_notifications(settings):
+    call_command("update_notifications")
+    synced = TemplateSync.objects.get()
+    settings.UNICEF_NOTIFICATION_OPTIMIZE_HTML = True
+    # the templates are synced again, optimized
+    call_command("update_notifications", lock=True)
+    assert TemplateSync.objects.get().content_hash != synced.content_hash
+    template = EmailTemplate.objects.get(name="author-new", language="")
+    assert template.html_content == "<em>Author</em>: {{author}}"
@@ -0,0 +1,150 @@
+from django.core.exceptions import ValidationError
+
+from post_office.models import Email
+
+import pytest
+from unittest.mock import patch
+
+from tests.factories import NotificationPreferenceFactory, UserFactory
+from unicef_notification import preferences
+from unicef_notification.batch import notification_batch
+from unicef_notification.models import Notification, NotificationPreference
+from unicef_notification.utils import send_notification, send_notification_with_template
+
+pytestmark = pytest.mark.django_db
+
+
+def test_address_normalized_on_save():
+    preference = NotificationPreferenceFactory(address="Joe <Joe@Example.com>")
+    assert preference.address == "joe@example.com"
+
+
+def test_clean(user):
+    with pytest.raises(ValidationError):
+        NotificationPreference().full_clean()
+    with pytest.raises(ValidationError):
+        NotificationPreference(user=user, address="joe@example.com").full_clean()
+    with pytest.raises(ValidationError):
+        NotificationPreference(
+            address="joe@example.com", template_name="a", template_group="b"
+        ).full_clean()
+    NotificationPreference(user=user, template_name="a").full_clean()
+
+
+def test_get_template_groups():
+    # from the group of the author-new definition module
+    assert preferences.get_template_groups() == {"author-new": "authors"}
+
+
+def test_load_preferences(django_assert_num_queries):
+    user = UserFactory(email="User@example.com")
+    NotificationPreferenceFactory(user=user, address="", template_name="a")
+    NotificationPreferenceFactory(address="joe@example.com")
+    with django_assert_num_queries(1):
+        for i in range(3):
+            loaded = preferences.load_preferences(
+                ["user@example.com", "Joe@example.com", "none@example.com"]
+            )
+    assert [p.template_name for p in loaded["user@example.com"]] == ["a"]
+    assert [p.by_address for p in loaded["joe@example.com"]] == [True]
+    assert loaded["none@example.com"] == []
+
+
+def test_reload_on_change():
+    assert preferences.load_preferences(["joe@example.com"])["joe@example.com"] == []
+    preference = NotificationPreferenceFactory(address="joe@example.com")
+    assert len(preferences.load_preferences(["joe@example.com"])["joe@example.com"]) == 1
+    preference.delete()
+    assert preferences.load_preferences(["joe@example.com"])["joe@example.com"] == []
+
+
+def test_cache_timeout(settings):
+    settings.UNICEF_NOTIFICATION_PREFERENCE_CACHE_TIMEOUT = 0
+    assert preferences.load_preferences(["joe@example.com"])["joe@example.com"] == []
+    # bulk_create sends no signals, so this is only picked up by the timeout
+    NotificationPreference.objects.bulk_create(
+        [NotificationPreferenceFactory.build(address="joe@example.com")]
+    )
+    assert len(preferences.load_preferences(["joe@example.com"])["joe@example.com"]) == 1
+
+
+def test_is_opted_in():
+    Preference = preferences.Preference
+    email = Notification.TYPE_EMAIL
+    all_out = Preference("", "", email, False, False)
+    group_in = Preference("", "authors", email, True, False)
+    template_out = Preference("author-new", "", email, False, False)
+    address_in = Preference("author-new", "", email, True, True)
+
+    assert preferences.is_opted_in([], "author-new", email)
+    assert not preferences.is_opted_in([all_out], "author-new", email)
+    assert not preferences.is_opted_in([all_out], "", email)
+    assert preferences.is_opted_in([all_out, group_in], "author-new", email)
+    assert not preferences.is_opted_in([all_out, group_in], "other", email)
+    assert not preferences.is_opted_in([group_in, template_out], "author-new", email)
+    assert preferences.is_opted_in([template_out, address_in], "author-new", email)
+    assert preferences.is_opted_in([all_out], "author-new", "SMS")
+
+
+def test_send_notification_with_template(email_template):
+    user = UserFactory(email="user@example.com")
+    NotificationPreferenceFactory(user=user, address="", template_name=email_template.name)
+    NotificationPreferenceFactory(address="other@example.com", template_name="other")
+    send_notification_with_template(
+        ["user@example.com", "other@example.com"],
+        email_template.name,
+        {},
+        cc=["user@example.com"],
+    )
+    notification = Notification.objects.get()
+    assert notification.recipients == ["other@example.com"]
+    assert notification.cc == []
+    assert notification.suppressed_recipients == ["user@example.com", "user@example.com"]
+
+
+def test_batch(email_template, django_assert_num_queries, django_capture_on_commit_callbacks):
+    NotificationPreferenceFactory(address="user0@example.com")
+    # warm up the template validation and suppressed addresses
+    send_notification_with_template(["a@example.com"], email_template.name, {}, send_disabled=True)
+    with django_capture_on_commit_callbacks() as callbacks:
+        with notification_batch():
+            for i in range(3):
+                send_notification_with_template(
+                    ["user{}@example.com".format(i)], email_template.name, {}, send_disabled=True
+                )
+    # the preferences of the batch are loaded in one query, then bulk create
+    with django_assert_num_queries(2):
+        for callback in callbacks:
+            callback()
+    assert sorted(
+        Notification.objects.exclude(recipients=[]).values_list("recipients", flat=True)
+    ) == [["a@example.com"], ["user1@example.com"], ["user2@example.com"]]
+
+
+def test_send_notification_with_template_all_opted_out(email_template):
+    NotificationPreferenceFactory(address="user@example.com")
+    with patch("unicef_notification.utils.provide_context") as mock_provide_context:
+        send_notification_with_template(["user@example.com"], email_template.name, {})
+    mock_provide_context.assert_not_called()
+    notification = Notification.objects.get()
+    assert notification.status == Notification.STATUS.suppressed
+    assert not Email.objects.exists()
+
+
+def test_send_notification_all_opted_out():
+    NotificationPreferenceFactory(address="user@example.com")
+    with patch("unicef_notification.utils.get_template_content") as mock_get_template_content:
+        send_notification(["user@example.com"], subject_filename="subject.txt")
+    mock_get_template_content.assert_not_called()
+    notification = Notification.objects.get()
+    assert notification.status == Notification.STATUS.suppressed
+    assert not Email.objects.exists()
+
+
+def test_batch_all_opted_out(email_template, django_capture_on_commit_callbacks):
+    NotificationPreferenceFactory(address="user@example.com")
+    with django_capture_on_commit_callbacks(execute=True):
+        with notification_batch():
+            send_notification_with_template(["user@example.com"], email_template.name, {})
+    assert Notification.objects.get().status == Notification.STATUS.suppressed
+    assert not Email.objects.exists()
@@ -0,0 +1,79 @@
+import json
+import pstats
+
+import pytest
+
+from tests.factories import NotificationFactory
+from unicef_notification import profiling
+from unicef_notification.utils import send_notification_with_template
+
+pytestmark = pytest.mark.django_db
+
+
+def test_disabled(email_template, tmp_path, settings):
+    settings.UNICEF_NOTIFICATION_PROFILE_DIR = str(tmp_path)
+    assert profiling.get_options() is None
+    NotificationFactory(template_name=email_template.name).send_mail()
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_enabled_by_setting(settings):
+    settings.UNICEF_NOTIFICATION_PROFILE = True
+    settings.UNICEF_NOTIFICATION_PROFILE_SAMPLE_RATE = 0.5
+    assert profiling.get_options().sample_rate == 0.5
+
+
+def test_profile_sample(email_template, tmp_path):
+    with profiling.profiling(sample_rate=1.0, directory=str(tmp_path)):
+        send_notification_with_template(["joe@example.com"], email_template.name, {})
+    # send_mail, called by send_notification_with_template, is not profiled apart
+    (report,) = tmp_path.iterdir()
+    assert report.name.endswith("-send_notification_with_template.prof")
+    stats = pstats.Stats(str(report))
+    assert stats.total_calls
+
+
+def test_slow_send(email_template, tmp_path):
+    notification = NotificationFactory(template_name=email_template.name)
+    with profiling.profiling(sample_rate=0, threshold=0, directory=str(tmp_path)):
+        notification.send_mail()
+    (report,) = tmp_path.iterdir()
+    assert report.name.endswith("-send_mail.json")
+    data = json.loads(report.read_text())
+    assert data["name"] == "send_mail"
+    assert data["duration"] > 0
+    assert data["query_count"] >= len(data["queries"]) > 0
+    assert any("post_office_email" in query["sql"] for query in data["queries"])
+    # parameters, e.g. the recipients, are not recorded
+    assert "test@example.com" not in report.read_text()
+
+
+def test_query_log():
+    query_log = profiling.QueryLog()
+    for i in range(3):
+        query_log(lambda *args: None, "SELECT %s", [i], False, {})
+    assert query_log.count == 3
+    (query,) = query_log.queries
+    assert query["sql"] == "SELECT %s"
+    assert query["count"] == 3
+
+
+def test_rotation(email_template, tmp_path):
+    with profiling.profiling(
+        sample_rate=1.0, threshold=0, directory=str(tmp_path), max_reports=3
+    ):
+        for i in range(3):
+            NotificationFactory(template_name=email_template.name).send_mail()
+    # the reports of the first send were deleted
+    assert len(list(tmp_path.iterdir())) == 3
+
+
+def test_rotation_keeps_other_files(email_template, tmp_path):
+    other = tmp_path / "00000000-other.json"
+    other.write_text("{}")
+    with profiling.profiling(
+        sample_rate=1.0, threshold=0, directory=str(tmp_path), max_reports=1
+    ):
+        NotificationFactory(template_name=email_template.name).send_mail()
+    assert other.exists()
+    assert len(list(tmp_path.iterdir())) == 2
@@ -0,0 +1,110 @@
+from post_office.models import Email, PRIORITY
+
+import pytest
+
+from tests.factories import EmailTemplateFactory, NotificationFactory
+from unicef_notification import rendering
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def render_cache(settings):
+    settings.UNICEF_NOTIFICATION_RENDER_CACHE_SIZE = 2
+    return rendering.get_render_cache()
+
+
+@pytest.fixture
+def greeting_template():
+    return EmailTemplateFactory(
+        name="greeting",
+        subject="Hello {{ name }}",
+        content="Dear {{ name }}",
+        html_content="<p>Dear {{ name }}</p>",
+    )
+
+
+def test_disabled():
+    assert rendering.get_render_cache() is None
+    assert rendering.get_render_cache_info() is None
+
+
+def test_render_email_template(greeting_template):
+    assert rendering.render_email_template(greeting_template, {"name": "Joe"}) == (
+        "Hello Joe",
+        "Dear Joe",
+        "<p>Dear Joe</p>",
+    )
+
+
+def test_context_hash():
+    assert rendering.context_hash({"a": 1, "b": 2}) == rendering.context_hash({"b": 2, "a": 1})
+    assert rendering.context_hash({"a": 1}) != rendering.context_hash({"a": 2})
+
+
+def test_render_cache(render_cache, greeting_template):
+    for i in range(3):
+        render_cache.render(greeting_template, {"name": "Joe"})
+    render_cache.render(greeting_template, {"name": "Jane"})
+    assert rendering.get_render_cache_info() == {
+        "hits": 2,
+        "misses": 2,
+        "size": 2,
+        "maxsize": 2,
+    }
+
+
+def test_render_cache_eviction(render_cache, greeting_template):
+    render_cache.render(greeting_template, {"name": "Joe"})
+    render_cache.render(greeting_template, {"name": "Jane"})
+    # Joe is the most recently used, Jane is evicted
+    render_cache.render(greeting_template, {"name": "Joe"})
+    render_cache.render(greeting_template, {"name": "Jim"})
+    render_cache.render(greeting_template, {"name": "Joe"})
+    render_cache.render(greeting_template, {"name": "Jane"})
+    assert render_cache.info()["misses"] == 4
+
+
+def test_render_cache_template_updated(render_cache, greeting_template):
+    render_cache.render(greeting_template, {"name": "Joe"})
+    greeting_template.subject = "Hi {{ name }}"
+    greeting_template.save()
+    rendered = render_cache.render(greeting_template, {"name": "Joe"})
+    assert rendered[0] == "Hi Joe"
+
+
+def test_render_cache_base_template_updated(render_cache, base_email_template, email_template):
+    assert "Base template" in render_cache.render(email_template, {})[2]
+    base_email_template.html_content = "<h1>New base</h1>{% block content %}{% endblock %}"
+    base_email_template.save()
+    rendered = render_cache.render(email_template, {})
+    assert "New base" in rendered[2]
+    assert render_cache.info()["hits"] == 0
+
+
+def test_send_mail_rendered_content_not_rendered_again(render_cache, mailoutbox):
+    EmailTemplateFactory(name="greeting", subject="Hello {{ name }}")
+    notification = NotificationFactory(
+        template_name="greeting", template_data={"name": "{{ joe }}"}, priority=PRIORITY.now
+    )
+    assert notification.send_mail()
+    assert mailoutbox[0].subject == "Hello {{ joe }}"
+
+
+def test_send_mail(render_cache, greeting_template, mailoutbox):
+    for priority in (PRIORITY.now, PRIORITY.medium):
+        notification = NotificationFactory(
+            template_name=greeting_template.name,
+            template_data={"name": "Joe"},
+            priority=priority,
+        )
+        assert notification.send_mail()
+        email = notification.sent_email
+        assert email.subject == "Hello Joe"
+        assert email.message == "Dear Joe"
+        assert email.html_message == "<p>Dear Joe</p>"
+        assert email.template == greeting_template
+        assert email.priority == priority
+    assert render_cache.info()["hits"] == 1
+    assert len(mailoutbox) == 1
+    assert Email.objects.count() == 2
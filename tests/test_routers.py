@@ -0,0 +1,74 @@
+from django.contrib.auth import get_user_model
+from django.db import connections, transaction
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from post_office.models import Email
+
+import pytest
+
+from tests.factories import NotificationFactory
+from unicef_notification.models import Notification, NotificationSummary
+from unicef_notification.routers import replica_reads, ReplicaRouter
+
+# the replica alias mirrors the default database, so the data must be
+# committed for its connection to see it
+pytestmark = pytest.mark.django_db(transaction=True, databases=["default", "replica"])
+
+
+@pytest.fixture
+def replica(settings):
+    settings.UNICEF_NOTIFICATION_REPLICA_DATABASE = "replica"
+    settings.DATABASE_ROUTERS = ["unicef_notification.routers.ReplicaRouter"]
+    return connections["replica"]
+
+
+def test_disabled():
+    with replica_reads():
+        assert Notification.objects.all().db == "default"
+    assert Notification.objects.reporting().db == "default"
+
+
+def test_replica_reads(replica):
+    notification = NotificationFactory()
+    assert Notification.objects.all().db == "default"
+    with replica_reads():
+        with CaptureQueriesContext(replica) as queries:
+            assert list(Notification.objects.all()) == [notification]
+        assert len(queries) == 1
+        # writes stay on the primary
+        assert Notification.objects.all()._db is None
+        Notification.objects.filter(pk=notification.pk).resend()
+        with transaction.atomic():
+            # reads of a primary transaction too, e.g. queue claims
+            assert Notification.objects.all().db == "default"
+            assert Notification.objects.claimable().select_for_update().get() == notification
+
+
+def test_replica_reads_other_apps(replica):
+    with replica_reads():
+        assert Notification.objects.all().db == "replica"
+        assert get_user_model().objects.all().db == "default"
+        assert Email.objects.all().db == "default"
+
+
+def test_reporting(replica):
+    notification = NotificationFactory(recipients=["joe@example.com"])
+    with CaptureQueriesContext(replica) as queries:
+        assert list(Notification.objects.reporting().addressed_to("joe@example.com")) == [notification]
+        assert list(NotificationSummary.objects.reporting().totals("status")) == []
+    assert len(queries) == 2
+
+
+def test_admin_changelist(replica, admin_client):
+    NotificationFactory()
+    url = reverse("admin:unicef_notification_notification_changelist")
+    with CaptureQueriesContext(replica) as queries:
+        response = admin_client.get(url)
+    assert response.status_code == 200
+    assert any("unicef_notification_notification" in query["sql"] for query in queries)
+
+
+def test_allow_migrate(replica):
+    assert ReplicaRouter().allow_migrate("replica", "unicef_notification") is False
+    assert ReplicaRouter().allow_migrate("default", "unicef_notification") is None
@@ -0,0 +1,95 @@
+import datetime
+
+from django.utils import timezone
+
+from post_office.models import Email
+
+import pytest
+
+from tests.factories import NotificationFactory, SuppressedAddressFactory
+from unicef_notification import suppression
+from unicef_notification.models import Notification, SuppressedAddress
+from unicef_notification.utils import send_notification_with_template
+
+pytestmark = pytest.mark.django_db
+
+
+def test_normalize_address():
+    assert suppression.normalize_address("Joe <Joe@Example.com>") == "joe@example.com"
+
+
+def test_address_normalized_on_save():
+    suppressed = SuppressedAddressFactory(address="Joe@Example.com")
+    assert suppressed.address == "joe@example.com"
+
+
+def test_filter_suppressed(django_assert_num_queries):
+    SuppressedAddressFactory(address="bounced@example.com")
+    SuppressedAddressFactory(
+        address="expired@example.com",
+        expires=timezone.now() - datetime.timedelta(days=1),
+    )
+    with django_assert_num_queries(1):
+        for i in range(5):
+            recipients, cc, removed = suppression.filter_suppressed(
+                ["Bounced@example.com", "expired@example.com"],
+                ["ok@example.com", "bounced@example.com"],
+            )
+    assert recipients == ["expired@example.com"]
+    assert cc == ["ok@example.com"]
+    assert removed == ["Bounced@example.com", "bounced@example.com"]
+
+
+def test_filter_suppressed_refresh(settings):
+    settings.UNICEF_NOTIFICATION_SUPPRESSION_REFRESH_INTERVAL = 0
+    assert suppression.get_suppressed_addresses() == frozenset()
+    # bulk_create sends no signals, so this is only picked up by the refresh
+    SuppressedAddress.objects.bulk_create(
+        [SuppressedAddressFactory.build(address="new@example.com")]
+    )
+    assert suppression.get_suppressed_addresses() == frozenset(["new@example.com"])
+
+
+def test_reload_on_change():
+    assert suppression.get_suppressed_addresses() == frozenset()
+    suppressed = SuppressedAddressFactory(address="new@example.com")
+    assert suppression.get_suppressed_addresses() == frozenset(["new@example.com"])
+    suppressed.delete()
+    assert suppression.get_suppressed_addresses() == frozenset()
+
+
+def test_send_notification_with_template_suppressed(email_template):
+    SuppressedAddressFactory(address="bounced@example.com")
+    send_notification_with_template(
+        ["bounced@example.com", "ok@example.com"],
+        email_template.name,
+        {},
+        cc=["bounced@example.com"],
+    )
+    notification = Notification.objects.get()
+    assert notification.recipients == ["ok@example.com"]
+    assert notification.cc == []
+    assert notification.suppressed_recipients == ["bounced@example.com", "bounced@example.com"]
+    assert notification.sent_email.to == ["ok@example.com"]
+
+
+def test_send_notification_all_suppressed(email_template):
+    SuppressedAddressFactory(address="bounced@example.com")
+    send_notification_with_template(["bounced@example.com"], email_template.name, {})
+    notification = Notification.objects.get()
+    assert notification.status == Notification.STATUS.suppressed
+    assert notification.sent_email is None
+    assert not Email.objects.exists()
+
+
+def test_send_pending_all_suppressed(email_template):
+    notification = NotificationFactory(
+        template_name=email_template.name,
+        recipients=[],
+        suppressed_recipients=["bounced@example.com"],
+        status=Notification.STATUS.pending,
+    )
+    Notification.send_pending()
+    notification.refresh_from_db()
+    assert notification.status == Notification.STATUS.suppressed
+    assert not Email.objects.exists()
@@ -1,9 +1,11 @@
+import datetime
 import json
 
 from django.conf import settings
 from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
 
-from post_office.models import Email
+from post_office.models import Email, PRIORITY
 
 import pytest
 from unittest.mock import patch
@@ -156,3 +158,60 @@ def test_send_notification_with_template_recipients_str(mock_mail, email_templat
     mock_mail.send.assert_called()
     call_kwargs = mock_mail.send.call_args[1]
     assert [recipients] == call_kwargs["recipients"]
+
+
+def test_send_notification_with_template_queued(email_template):
+    utils.send_notification_with_template(
+        ["test@example.com"],
+        email_template.name,
+        {},
+        priority="high",
+        queued=True,
+    )
+    notification = Notification.objects.get()
+    assert notification.status == Notification.STATUS.pending
+    assert notification.priority == PRIORITY.high
+    assert notification.sent_email is None
+    assert Email.objects.count() == 0
+
+
+@patch("unicef_notification.models.mail")
+def test_send_notification_priority(mock_mail, file_html):
+    mock_mail.send.return_value = Email()
+    with patch.object(Notification, "save"):
+        utils.send_notification(
+            ["test@example.com"], content_filename=file_html, priority="now"
+        )
+    call_kwargs = mock_mail.send.call_args[1]
+    assert PRIORITY.now == call_kwargs["priority"]
+
+
+def test_send_notification_with_template_send_at(email_template):
+    send_at = timezone.now() + datetime.timedelta(hours=1)
+    utils.send_notification_with_template(
+        ["test@example.com"],
+        email_template.name,
+        {},
+        send_at=send_at,
+    )
+    notification = Notification.objects.get()
+    assert notification.status == Notification.STATUS.scheduled
+    assert notification.send_at == send_at
+    assert Email.objects.count() == 0
+    assert Notification.queue_scheduled() == 0
+    with patch("unicef_notification.models.timezone.now") as mock_now:
+        mock_now.return_value = send_at
+        assert Notification.queue_scheduled() == 1
+    notification.refresh_from_db()
+    assert notification.status == Notification.STATUS.pending
+
+
+def test_send_notification_send_disabled_send_at(email_template):
+    utils.send_notification_with_template(
+        ["test@example.com"],
+        email_template.name,
+        {},
+        send_at=timezone.now(),
+        send_disabled=True,
+    )
+    assert Notification.objects.get().status == Notification.STATUS.draft
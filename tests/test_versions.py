@@ -0,0 +1,128 @@
+from django.core.management import call_command
+from django.db import DatabaseError, transaction
+
+import pytest
+from unittest.mock import patch
+
+from tests.factories import EmailTemplateFactory, NotificationFactory
+from unicef_notification.models import TemplateVersion
+from unicef_notification.versions import get_template_version_id, template_content_hash
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def greeting_template():
+    return EmailTemplateFactory(
+        name="greeting",
+        subject="Hello {{ name }}",
+        content="Dear {{ name }}",
+        html_content="<p>Dear {{ name }}</p>",
+    )
+
+
+def test_get_template_version_id(greeting_template):
+    version_id = get_template_version_id(greeting_template)
+    assert get_template_version_id(greeting_template) == version_id
+    greeting_template.subject = "Hi {{ name }}"
+    greeting_template.save()
+    assert get_template_version_id(greeting_template) != version_id
+    assert TemplateVersion.objects.filter(name="greeting").count() == 2
+
+
+def test_get_template_version_id_cached(
+    greeting_template, django_assert_num_queries, django_capture_on_commit_callbacks
+):
+    with django_capture_on_commit_callbacks(execute=True):
+        version_id = get_template_version_id(greeting_template)
+    with django_assert_num_queries(0):
+        assert get_template_version_id(greeting_template) == version_id
+
+
+def test_references(base_email_template, email_template):
+    version = TemplateVersion.objects.get(pk=get_template_version_id(email_template))
+    assert version.references == {"test_base": get_template_version_id(base_email_template)}
+    base_email_template.html_content = "<h1>New base</h1>"
+    base_email_template.save()
+    # the template gets a new version along with its base template
+    assert get_template_version_id(email_template) != version.pk
+
+
+def test_content_hash_cached(greeting_template):
+    with patch(
+        "unicef_notification.versions.template_content_hash", wraps=template_content_hash
+    ) as mock_hash:
+        for i in range(3):
+            get_template_version_id(greeting_template)
+        greeting_template.subject = "Hi {{ name }}"
+        greeting_template.save()
+        get_template_version_id(greeting_template)
+    # once per saved content
+    assert mock_hash.call_count == 2
+
+
+def test_immutable(greeting_template):
+    version = TemplateVersion.objects.get(pk=get_template_version_id(greeting_template))
+    version.subject = "Hi"
+    with pytest.raises(ValueError):
+        version.save()
+
+
+def test_send_mail(greeting_template, mailoutbox):
+    notification = NotificationFactory(
+        template_name=greeting_template.name, template_data={"name": "Joe"}
+    )
+    assert notification.send_mail()
+    greeting_template.subject = "Hi {{ name }}"
+    greeting_template.save()
+
+    notification.refresh_from_db()
+    version = notification.template_version
+    assert version.subject == "Hello {{ name }}"
+    # the notification is re-rendered exactly as sent
+    assert version.render(notification.template_data) == (
+        "Hello Joe",
+        "Dear Joe",
+        "<p>Dear Joe</p>",
+    )
+
+
+def test_send_mail_base_template_updated(base_email_template, email_template, mailoutbox):
+    notification = NotificationFactory(template_name=email_template.name)
+    assert notification.send_mail()
+    base_email_template.html_content = "<h1>New base</h1>{% block content %}{% endblock %}"
+    base_email_template.save()
+
+    notification.refresh_from_db()
+    # rendered again with the base template it was sent with
+    html = notification.template_version.render(notification.template_data)[2]
+    assert "Base template" in html
+    assert "Template1" in html
+
+
+def test_update_notifications():
+    call_command("update_notifications")
+    assert TemplateVersion.objects.filter(name="author-translated", language="fr").exists()
+    count = TemplateVersion.objects.count()
+    # unchanged templates get no new version
+    call_command("update_notifications")
+    assert TemplateVersion.objects.count() == count
+
+
+def test_get_template_version_id_cached_in_transaction(
+    greeting_template, django_assert_num_queries
+):
+    version_id = get_template_version_id(greeting_template)
+    with django_assert_num_queries(0):
+        assert get_template_version_id(greeting_template) == version_id
+
+
+def test_get_template_version_id_rolled_back(greeting_template):
+    try:
+        with transaction.atomic():
+            get_template_version_id(greeting_template)
+            raise DatabaseError
+    except DatabaseError:
+        pass
+    version_id = get_template_version_id(greeting_template)
+    assert TemplateVersion.objects.filter(pk=version_id).exists()
@@ -0,0 +1,51 @@
+from django.core.management import call_command
+from django.db import connection
+
+import pytest
+from unittest.mock import patch
+
+from tests.factories import NotificationFactory
+from unicef_notification import wakeup
+from unicef_notification.models import Notification
+
+pytestmark = pytest.mark.django_db(transaction=True)
+
+
+@pytest.fixture
+def listening():
+    wakeup.listen()
+    # discard notifications from earlier tests
+    wakeup.wait(0)
+    yield
+    with connection.cursor() as cursor:
+        cursor.execute("UNLISTEN *")
+
+
+def test_wait_timeout(listening):
+    assert not wakeup.wait(0.01)
+
+
+def test_notify_on_pending_insert(listening, email_template):
+    NotificationFactory(template_name=email_template.name, status=Notification.STATUS.pending)
+    assert wakeup.wait(1)
+    assert not wakeup.wait(0.01)
+
+
+def test_no_notify_on_draft_insert(listening, email_template):
+    NotificationFactory(template_name=email_template.name)
+    assert not wakeup.wait(0.01)
+
+
+def test_notify_on_resend(listening, email_template):
+    NotificationFactory(template_name=email_template.name)
+    Notification.objects.all().resend()
+    assert wakeup.wait(1)
+
+
+def test_send_notifications_listen(email_template):
+    NotificationFactory(template_name=email_template.name, status=Notification.STATUS.pending)
+    with patch.object(wakeup, "wait", side_effect=[True, KeyboardInterrupt()]) as mock_wait:
+        with pytest.raises(KeyboardInterrupt):
+            call_command("send_notifications", listen=True, interval=5)
+    mock_wait.assert_called_with(5)
+    assert not Notification.objects.pending().exists()